@@ -0,0 +1,212 @@
+"""
+Claude-powered explanations and recommendations for at-risk students
+
+Prompt construction and the Messages API call live here, independent of
+Streamlit, so they can be reused by batch jobs and exercised with a fake
+client. Responses go through an optional ResponseCache.
+"""
+
+import queue
+import threading
+
+from llm_cache import cache_key
+
+MODEL = "claude-sonnet-4-20250514"
+
+# Bump whenever a prompt template changes so cached responses are not reused
+PROMPT_VERSION = 1
+
+EXPLANATION_MAX_TOKENS = 300
+RECOMMENDATIONS_MAX_TOKENS = 400
+
+# Streaming deadlines: wait for the first token, then between tokens
+FIRST_TOKEN_TIMEOUT_SECONDS = 10.0
+STALL_TIMEOUT_SECONDS = 5.0
+
+_STREAM_DONE = object()
+
+
+class StreamStalled(Exception):
+    """No token arrived within the streaming deadline"""
+
+
+def explanation_prompt(student_metrics, student_data):
+    """Prompt asking why a student is at risk"""
+    return f"""Analyze this student's tutoring data and explain WHY they are at risk:
+
+Student: {student_metrics['student_name']} (Grade {student_metrics['grade_level']})
+Risk Level: {student_metrics['risk_level']}
+
+Metrics:
+- Average Engagement: {student_metrics['avg_engagement']:.1f}/10
+- Engagement Trend: {student_metrics['engagement_trend']:.1f} (recent vs early)
+- Session Completion Rate: {student_metrics['completion_rate']:.0%}
+- Homework Completion Rate: {student_metrics['homework_rate']:.0%}
+- Attendance Rate: {student_metrics['attendance_rate']:.0%}
+- Total Sessions: {student_metrics['total_sessions']}
+- Days Since Last Session: {student_metrics['days_since_last']}
+
+Recent Session Data:
+{student_data.tail(5)[['session_date', 'engagement_score', 'completed', 'homework_completed', 'subject']].to_string()}
+
+Provide a concise 2-3 sentence explanation of the key risk factors and patterns you observe."""
+
+
+def recommendations_prompt(student_metrics):
+    """Prompt asking for three interventions"""
+    return f"""Based on this at-risk student's data, recommend 3 specific interventions:
+
+Student: {student_metrics['student_name']} (Grade {student_metrics['grade_level']})
+Risk Level: {student_metrics['risk_level']}
+Risk Factors: {', '.join(student_metrics['risk_factors'])}
+
+Key Metrics:
+- Avg Engagement: {student_metrics['avg_engagement']:.1f}/10
+- Engagement Trend: {student_metrics['engagement_trend']:.1f}
+- Completion Rate: {student_metrics['completion_rate']:.0%}
+- Homework Rate: {student_metrics['homework_rate']:.0%}
+- Attendance: {student_metrics['attendance_rate']:.0%}
+
+Provide 3 actionable recommendations as a numbered list. Be specific and practical."""
+
+
+def response_key(prompt, max_tokens, model=MODEL):
+    """Response cache key of a prompt"""
+    return cache_key(model, prompt, PROMPT_VERSION, max_tokens=max_tokens)
+
+
+def complete(client, prompt, max_tokens, cache=None, model=MODEL):
+    """Send a single-turn prompt, serving repeats from the response cache"""
+    key = response_key(prompt, max_tokens, model)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    message = client.messages.create(
+        model=model,
+        max_tokens=max_tokens,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    text = message.content[0].text
+
+    if cache is not None:
+        cache.set(key, text)
+    return text
+
+
+async def acomplete(client, prompt, max_tokens, cache=None, model=MODEL):
+    """Async variant of complete() for an AsyncAnthropic-style client"""
+    key = response_key(prompt, max_tokens, model)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    message = await client.messages.create(
+        model=model,
+        max_tokens=max_tokens,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    text = message.content[0].text
+
+    if cache is not None:
+        cache.set(key, text)
+    return text
+
+
+def stream_complete(client, prompt, max_tokens, cache=None, model=MODEL,
+                    first_token_timeout=FIRST_TOKEN_TIMEOUT_SECONDS,
+                    stall_timeout=STALL_TIMEOUT_SECONDS):
+    """Yield the response text as it streams in.
+
+    A cached response is yielded in one piece. The stream is read on a
+    background thread so a stall can be detected: StreamStalled is raised if
+    the first token takes longer than first_token_timeout, or any later one
+    longer than stall_timeout, and the abandoned stream is closed. Only
+    complete responses are cached.
+    """
+    key = response_key(prompt, max_tokens, model)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    chunks = queue.Queue()
+    abandoned = threading.Event()
+    opened = []
+
+    def produce():
+        try:
+            with client.messages.stream(
+                model=model,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}]
+            ) as stream:
+                opened.append(stream)
+                if abandoned.is_set():
+                    return
+                for text in stream.text_stream:
+                    if abandoned.is_set():
+                        return
+                    chunks.put(text)
+            chunks.put(_STREAM_DONE)
+        except Exception as e:
+            chunks.put(e)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    parts = []
+    timeout = first_token_timeout
+    done = False
+    try:
+        while True:
+            try:
+                item = chunks.get(timeout=timeout)
+            except queue.Empty:
+                raise StreamStalled(f"no response from Claude for {timeout:g}s")
+            if item is _STREAM_DONE:
+                done = True
+                break
+            if isinstance(item, Exception):
+                raise item
+            parts.append(item)
+            yield item
+            timeout = stall_timeout
+    finally:
+        abandoned.set()
+        if not done:
+            # Unblock a producer still waiting on the connection so it gives
+            # back its request slot now rather than at the read timeout
+            for stream in opened:
+                stream.close()
+
+    if cache is not None:
+        cache.set(key, "".join(parts))
+
+
+def is_cached(cache, prompt, max_tokens, model=MODEL):
+    """Whether a response is already cached, without touching the counters"""
+    key = response_key(prompt, max_tokens, model)
+    return cache.peek(key)
+
+
+def generate_explanation(client, student_metrics, student_data, cache=None):
+    return complete(client, explanation_prompt(student_metrics, student_data),
+                    EXPLANATION_MAX_TOKENS, cache)
+
+
+def generate_recommendations(client, student_metrics, cache=None):
+    return complete(client, recommendations_prompt(student_metrics),
+                    RECOMMENDATIONS_MAX_TOKENS, cache)
+
+
+def stream_explanation(client, student_metrics, student_data, cache=None):
+    return stream_complete(client, explanation_prompt(student_metrics, student_data),
+                           EXPLANATION_MAX_TOKENS, cache)
+
+
+def stream_recommendations(client, student_metrics, cache=None):
+    return stream_complete(client, recommendations_prompt(student_metrics),
+                           RECOMMENDATIONS_MAX_TOKENS, cache)
@@ -0,0 +1,38 @@
+"""
+Synthetic session datasets for the benchmarks
+
+The sample generator's output is tiled with fresh student ids until the
+requested number of sessions is reached.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from generate_data import generate_tutoring_data
+
+
+def sample_sessions():
+    """The generator's sample data set"""
+    with tempfile.TemporaryDirectory() as workdir:
+        path = generate_tutoring_data(os.path.join(workdir, "sample.csv"))
+        df = pd.read_csv(path)
+    df['session_date'] = pd.to_datetime(df['session_date'])
+    return df
+
+
+def tiled_sessions(rows, batch_rows=1_000_000):
+    """Yield frames totalling `rows` sessions, each tile with its own students"""
+    sample = sample_sessions()
+    for offset in range(0, rows, batch_rows):
+        positions = np.arange(offset, min(offset + batch_rows, rows))
+        df = sample.iloc[positions % len(sample)].reset_index(drop=True)
+        copy_number = pd.Series(positions // len(sample)).map("{:06d}".format)
+        df['student_id'] = df['student_id'] + "-" + copy_number
+        yield df
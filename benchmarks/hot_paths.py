@@ -0,0 +1,178 @@
+"""
+Hot-path benchmark suite
+
+Times the dashboard's hot paths (load_data, calculate_risk_metrics, the
+cohort rollup build, create_overview_charts, create_engagement_trend_chart
+and the rule-based explanation and recommendations) on generated data sets of increasing size,
+recording the best wall time of several runs and the peak memory of one.
+Per-student functions are timed over the 20 highest-risk students.
+
+Results can be saved as a baseline and later runs compared against it; the
+comparison exits non-zero when any case got slower or hungrier than the
+tolerance allows, so CI can gate deploys on it:
+
+    python benchmarks/hot_paths.py --save benchmarks/baseline.json
+    python benchmarks/hot_paths.py --compare benchmarks/baseline.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from streamlit import logger as st_logger
+
+import bench_data  # noqa: F401 - puts the repo root on sys.path
+
+import dashboard
+import scoring
+from generate_data import generate_tutoring_data
+from risk_engine import calculate_risk_metrics
+from rollups import CohortRollup
+from session_index import SessionIndex
+from session_io import DEFAULT_DATA_FILE, columnar_path
+
+SIZES = [1_000, 10_000, 100_000]  # students; ~22 sessions each
+SAMPLE_STUDENTS = 20
+
+# Differences below these never count as regressions (timer noise, small buffers)
+TIME_SLACK_SECONDS = 0.02
+MEMORY_SLACK_MIB = 1
+
+
+def measure(fn, repeat):
+    """Best wall time of `repeat` runs, and the peak memory of one run in MiB.
+
+    Peak memory is traced with tracemalloc, which sees Python, NumPy and
+    pandas allocations (but not Arrow's own buffers) and, unlike RSS, does
+    not depend on what the allocator kept from earlier cases.
+    """
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    peak_mib = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"seconds": min(timings), "peak_mib": peak_mib}
+
+
+def hot_paths(students, workdir):
+    """Benchmark cases for a generated data set of `students` students"""
+    generate_tutoring_data(columnar_path(os.path.join(workdir, DEFAULT_DATA_FILE)), students=students)
+    os.chdir(workdir)
+
+    def load():
+        dashboard.load_data.clear()
+        return dashboard.load_data()
+
+    df = load()
+    metrics = calculate_risk_metrics(df)
+    risk_levels = metrics.set_index('student_id')['risk_level']
+    rollup = CohortRollup.from_sessions(df, risk_levels)
+    index = SessionIndex(df)
+    sample = [(row, index.sessions_for(row['student_id']))
+              for _, row in metrics.nlargest(SAMPLE_STUDENTS, 'risk_score').iterrows()]
+
+    return {
+        "load_data": load,
+        "calculate_risk_metrics": lambda: calculate_risk_metrics(df),
+        "build_cohort_rollup": lambda: CohortRollup.from_sessions(df, risk_levels),
+        "create_overview_charts": lambda: dashboard.create_overview_charts(rollup, metrics),
+        "create_engagement_trend_chart": lambda: [
+            dashboard.create_engagement_trend_chart(sessions) for _, sessions in sample],
+        "generate_rule_based_explanation": lambda: [
+            scoring.generate_rule_based_explanation(row, sessions) for row, sessions in sample],
+        "generate_rule_based_recommendations": lambda: [
+            scoring.generate_rule_based_recommendations(row) for row, _ in sample],
+    }
+
+
+def run_suite(sizes, repeat):
+    results = {}
+    cwd = os.getcwd()
+    print(f"{'case':<52}{'best (s)':>10}{'peak (MiB)':>12}")
+    for students in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            try:
+                for name, fn in hot_paths(students, workdir).items():
+                    case = f"{name}[{students}]"
+                    results[case] = measure(fn, repeat)
+                    print(f"{case:<52}{results[case]['seconds']:>10.4f}{results[case]['peak_mib']:>12.1f}")
+            finally:
+                os.chdir(cwd)
+    return results
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance):
+    """Print each case against the baseline and return the regressed cases"""
+    regressions = []
+    print(f"\n{'case':<52}{'time':>10}{'memory':>10}")
+    for case, result in results.items():
+        base = baseline.get(case)
+        if base is None:
+            print(f"{case:<52}{'new':>10}")
+            continue
+        slower = result["seconds"] > max(base["seconds"] * time_tolerance,
+                                         base["seconds"] + TIME_SLACK_SECONDS)
+        hungrier = result["peak_mib"] > max(base["peak_mib"] * memory_tolerance,
+                                            base["peak_mib"] + MEMORY_SLACK_MIB)
+        time_ratio = result["seconds"] / base["seconds"] if base["seconds"] else float("inf")
+        memory_change = result["peak_mib"] - base["peak_mib"]
+        print(f"{case:<52}{time_ratio:>9.2f}x{memory_change:>+8.0f}MiB"
+              f"{'  ⚠️ regression' if slower or hungrier else ''}")
+        if slower or hungrier:
+            regressions.append(case)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-path benchmark suite")
+    parser.add_argument("--students", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="write results to this baseline file")
+    parser.add_argument("--compare", help="baseline file to compare against")
+    parser.add_argument("--time-tolerance", type=float, default=2.0,
+                        help="allowed slowdown factor before a case fails")
+    parser.add_argument("--memory-tolerance", type=float, default=1.25,
+                        help="allowed peak-memory growth factor before a case fails")
+    args = parser.parse_args()
+
+    # Streamlit warns about running without a server on every cached call
+    st_logger.set_log_level("error")
+
+    results = run_suite(args.students, args.repeat)
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump({
+                "environment": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpus": os.cpu_count(),
+                },
+                "results": results,
+            }, baseline_file, indent=2)
+        print(f"\n✅ Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} case(s) regressed beyond tolerance")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Cold-load benchmark: CSV vs columnar Parquet
+
+Builds an N-row session export by tiling the generated sample data with
+fresh student ids, converts it to Parquet, then loads each format in a fresh
+subprocess and reports wall time and peak RSS.
+
+    python benchmarks/load_formats.py --rows 10000000
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from bench_data import tiled_sessions
+from session_io import convert_csv_to_parquet
+
+# Each loader runs in its own interpreter so RSS is not shared between runs
+LOADERS = {
+    "csv (read_csv, all columns)": (
+        "import pandas as pd\n"
+        "df = pd.read_csv({path!r})\n"
+        "df['session_date'] = pd.to_datetime(df['session_date'])\n"
+    ),
+    "csv (typed, projected)": (
+        "import session_io\n"
+        "session_io.pa = None\n"
+        "df = session_io.load_sessions({path!r})\n"
+    ),
+    "parquet (typed, projected)": (
+        "import session_io\n"
+        "df = session_io.load_sessions({parquet!r})\n"
+    ),
+}
+
+
+def build_export(rows, workdir):
+    """Write an N-row CSV export derived from the sample generator"""
+    path = os.path.join(workdir, "sessions.csv")
+    writer = None
+    for df in tiled_sessions(rows):
+        df['session_date'] = df['session_date'].dt.strftime("%Y-%m-%d")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if writer is None:
+            writer = pa_csv.CSVWriter(path, table.schema)
+        writer.write_table(table)
+    writer.close()
+    return path
+
+
+# Printed by the child: peak RSS of its own address space (VmHWM is reset on
+# exec, unlike ru_maxrss) and the deep size of the loaded frame
+REPORT = (
+    "peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+    "if os.path.exists('/proc/self/status'):\n"
+    "    with open('/proc/self/status') as status:\n"
+    "        peak_kb = next(int(l.split()[1]) for l in status if l.startswith('VmHWM'))\n"
+    "print(peak_kb / 1024, df.memory_usage(deep=True).sum() / 2**20)\n"
+)
+
+
+def run_loader(code):
+    script = "import os, resource, sys\nsys.path.insert(0, {root!r})\n".format(root=ROOT) + code + REPORT
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        return None
+    output = result.stdout
+    peak_mib, frame_mib = map(float, output.split()[-2:])
+    return elapsed, peak_mib, frame_mib
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = build_export(args.rows, workdir)
+        start = time.perf_counter()
+        parquet = convert_csv_to_parquet(path)
+        convert_seconds = time.perf_counter() - start
+
+        print(f"\n{args.rows:,} rows | CSV {os.path.getsize(path) / 2**20:,.0f} MiB | "
+              f"Parquet {os.path.getsize(parquet) / 2**20:,.0f} MiB | "
+              f"one-off conversion {convert_seconds:.1f}s\n")
+        print(f"{'format':<30}{'cold load (s)':>15}{'peak RSS (MiB)':>16}{'frame (MiB)':>13}")
+        for name, code in LOADERS.items():
+            measurement = run_loader(code.format(path=path, parquet=parquet))
+            if measurement is None:
+                print(f"{name:<30}{'failed (out of memory?)':>44}")
+                continue
+            elapsed, peak_mib, frame_mib = measurement
+            print(f"{name:<30}{elapsed:>15.2f}{peak_mib:>16,.0f}{frame_mib:>13,.0f}")
+
+
+if __name__ == "__main__":
+    main()
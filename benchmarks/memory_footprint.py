@@ -0,0 +1,126 @@
+"""
+Memory footprint of the resident data: sessions, session index and metrics
+
+Builds an N-row session export (see load_formats.py), then loads, scores and
+indexes it in three layouts and reports what each keeps resident, per
+structure and per student:
+
+- "read_csv": every column as parsed (object strings, int64, tutor notes),
+  risk factors as per-student lists and the index as a sorted frame copy
+- "typed": the projected, categorical Parquet load without downcasting, with
+  list risk factors and a sorted copy (the layout before compaction)
+- "compact": the current layout, with downcast sessions, the factor bitmask
+  and a positions-only index
+
+Sizes are exact rather than `memory_usage(deep=True)`, which counts a shared
+string once per reference: every array is counted, and every Python object
+once however many cells point at it.
+
+    python benchmarks/memory_footprint.py --rows 2000000
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+import session_io
+from load_formats import build_export
+from risk_engine import calculate_risk_metrics, decode_risk_factors
+from session_index import SessionIndex
+
+NOW = "2025-06-01"
+LEGACY_INTEGERS = {c: 'int64' for c in ('grade_level', 'risk_score', 'total_sessions', 'days_since_last')}
+
+
+def _objects_bytes(values, seen):
+    total = 0
+    for value in values:
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        total += sys.getsizeof(value)
+        if isinstance(value, list):
+            total += _objects_bytes(value, seen)
+    return total
+
+
+def frame_bytes(df, seen):
+    """Bytes a frame keeps alive that are not already counted in `seen`"""
+    total = 0
+    for _, column in df.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes, categories = column.cat.codes.to_numpy(), column.cat.categories
+            total += codes.nbytes
+            if id(categories) not in seen:
+                seen.add(id(categories))
+                total += categories.memory_usage() + _objects_bytes(categories, seen)
+        elif column.dtype == object:
+            total += column.to_numpy().nbytes + _objects_bytes(column, seen)
+        else:
+            total += column.memory_usage(index=False)
+    return total
+
+
+def load_read_csv(path, parquet):
+    sessions = pd.read_csv(path)
+    sessions['session_date'] = pd.to_datetime(sessions['session_date'])
+    return sessions, sessions.take(SessionIndex(sessions)._order), \
+        decode_risk_factors(calculate_risk_metrics(sessions, now=NOW)).astype(LEGACY_INTEGERS)
+
+
+def load_typed(path, parquet):
+    compact_sessions = session_io.compact_sessions
+    session_io.compact_sessions = lambda df: df
+    try:
+        sessions = session_io.load_sessions(parquet)
+    finally:
+        session_io.compact_sessions = compact_sessions
+    return sessions, sessions.take(SessionIndex(sessions)._order), \
+        decode_risk_factors(calculate_risk_metrics(sessions, now=NOW)).astype(LEGACY_INTEGERS)
+
+
+def load_compact(path, parquet):
+    sessions = session_io.load_sessions(parquet)
+    return sessions, SessionIndex(sessions)._order, calculate_risk_metrics(sessions, now=NOW)
+
+
+LAYOUTS = {"read_csv": load_read_csv, "typed": load_typed, "compact": load_compact}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = build_export(args.rows, workdir)
+        parquet = session_io.convert_csv_to_parquet(path)
+
+        print(f"\n{args.rows:,} sessions\n")
+        print(f"{'layout':<10}{'sessions':>11}{'index':>10}{'metrics':>10}{'total':>10}"
+              f"{'B/student':>11}{'students/GiB':>14}")
+        print(f"{'':<10}{'(MiB)':>11}{'(MiB)':>10}{'(MiB)':>10}{'(MiB)':>10}")
+        for name, load in LAYOUTS.items():
+            sessions, index, metrics = load(path, parquet)
+            seen = set()
+            sizes = [frame_bytes(sessions, seen),
+                     index.nbytes if isinstance(index, np.ndarray) else frame_bytes(index, seen),
+                     frame_bytes(metrics, seen)]
+            total, students = sum(sizes), len(metrics)
+            print(f"{name:<10}" + "".join(f"{size / 2**20:>{width},.1f}"
+                                           for size, width in zip(sizes, (11, 10, 10)))
+                  + f"{total / 2**20:>10,.1f}{total / students:>11,.0f}{2**30 * students / total:>14,.0f}")
+            del sessions, index, metrics
+            gc.collect()
+
+
+if __name__ == "__main__":
+    main()
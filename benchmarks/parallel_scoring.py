@@ -0,0 +1,47 @@
+"""
+Parallel scoring benchmark
+
+Scores a tiled synthetic data set with calculate_risk_metrics using 1, 2, 4
+and 8 worker processes, checks every run matches the serial result exactly,
+and reports the best of several runs.
+
+    python benchmarks/parallel_scoring.py --rows 5000000
+"""
+
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from bench_data import tiled_sessions
+from risk_engine import calculate_risk_metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel scoring benchmark")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = pd.concat(tiled_sessions(args.rows), ignore_index=True)
+    now = pd.Timestamp.now()
+    reference = calculate_risk_metrics(df, now=now)
+    print(f"\n{len(df):,} sessions | {len(reference):,} students | {os.cpu_count()} CPUs\n")
+    print(f"{'workers':>8}{'best (s)':>10}{'speedup':>9}{'identical':>11}")
+
+    baseline = None
+    for workers in args.workers:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            metrics = calculate_risk_metrics(df, now=now, workers=workers)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        baseline = baseline or best
+        print(f"{workers:>8}{best:>10.2f}{baseline / best:>8.2f}x{str(metrics.equals(reference)):>11}")
+
+
+if __name__ == "__main__":
+    main()
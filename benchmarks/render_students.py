@@ -0,0 +1,99 @@
+"""
+Dashboard render benchmark
+
+Runs dashboard.py headlessly with Streamlit's AppTest against data sets of
+100, 1,000 and 10,000 students (the sample data tiled with fresh student ids)
+and reports the cold run time, the time of a rerun with warm caches and the
+size of the messages a browser would receive. Pass --script to benchmark
+another copy of the dashboard, e.g. an older revision:
+
+    git show HEAD~1:dashboard.py > /tmp/old_dashboard.py
+    python benchmarks/render_students.py --script /tmp/old_dashboard.py
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+
+from bench_data import ROOT, sample_sessions
+
+_payload_bytes = []
+
+
+def _measure_payload(parse_tree):
+    def parse(messages):
+        _payload_bytes.append(sum(message.ByteSize() for message in messages))
+        return parse_tree(messages)
+    return parse
+
+
+local_script_runner.parse_tree_from_messages = _measure_payload(
+    local_script_runner.parse_tree_from_messages)
+
+
+def student_sessions(students):
+    """Sample sessions tiled until there are `students` distinct students.
+
+    Each copy is shifted by a second so no two students' charts are identical.
+    """
+    sample = sample_sessions()
+    per_copy = sample['student_id'].nunique()
+    copies = -(-students // per_copy)
+    frames = []
+    for copy_number in range(copies):
+        df = sample.copy()
+        df['student_id'] = df['student_id'] + f"-{copy_number:05d}"
+        df['session_date'] = df['session_date'] + pd.to_timedelta(copy_number, unit='s')
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+    keep = df['student_id'].unique()[:students]
+    return df[df['student_id'].isin(keep)].reset_index(drop=True)
+
+
+def run(app):
+    _payload_bytes.clear()
+    start = time.perf_counter()
+    app.run()
+    seconds = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return seconds, sum(_payload_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard render benchmark")
+    parser.add_argument("--students", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--script", default=os.path.join(ROOT, "dashboard.py"))
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+    script = os.path.abspath(args.script)
+
+    # Never call the API from a benchmark; the dashboard falls back to rules
+    os.environ.pop("ANTHROPIC_API_KEY", None)
+
+    print(f"{'students':>9} {'cold':>8} {'rerun':>8} {'payload':>10}")
+    for students in args.students:
+        with tempfile.TemporaryDirectory() as workdir:
+            student_sessions(students).to_csv(os.path.join(workdir, "tutoring_data.csv"),
+                                              index=False)
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                st.cache_data.clear()
+                st.cache_resource.clear()
+                app = AppTest.from_file(script, default_timeout=args.timeout)
+                cold, payload = run(app)
+                rerun, _ = run(app)
+            finally:
+                os.chdir(cwd)
+        print(f"{students:>9,} {cold:>7.2f}s {rerun:>7.2f}s {payload / 1e6:>8.2f}MB")
+
+
+if __name__ == "__main__":
+    main()
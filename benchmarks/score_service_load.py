@@ -0,0 +1,151 @@
+"""
+Score service load test
+
+Drives score_service.py with concurrent keep-alive connections for a fixed
+duration and reports requests/sec and latency percentiles for single-student
+lookups and bulk lookups. Without --url a service is started on a generated
+data set (--students students) and stopped afterwards:
+
+    python benchmarks/score_service_load.py --students 10000 --connections 32
+    python benchmarks/score_service_load.py --url http://127.0.0.1:8080
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from bench_data import ROOT
+
+from generate_data import generate_tutoring_data
+from perf import percentile
+from session_io import columnar_path
+
+
+async def _request(reader, writer, method, path, body=b""):
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) != b"\r\n":
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def _worker(host, port, make_request, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = await _request(reader, writer, *make_request())
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run_scenario(host, port, make_request, connections, seconds):
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*[_worker(host, port, make_request, start + seconds, latencies, errors)
+                           for _ in range(connections)])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+    }
+
+
+async def wait_until_ready(host, port, timeout=120):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            status, body = await _request(reader, writer, "GET", "/health")
+            writer.close()
+            if status == 200 and json.loads(body)["status"] == "ok":
+                return
+        except OSError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"score service on {host}:{port} did not become ready")
+
+
+async def student_ids(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    _, body = await _request(reader, writer, "GET", "/students")
+    writer.close()
+    return json.loads(body)["student_ids"]
+
+
+async def load_test(host, port, connections, seconds, bulk_size):
+    await wait_until_ready(host, port)
+    ids = await student_ids(host, port)
+
+    def single():
+        return "GET", f"/students/{random.choice(ids)}"
+
+    def bulk():
+        return "POST", "/students/scores", json.dumps(
+            {"student_ids": random.sample(ids, min(bulk_size, len(ids)))}).encode()
+
+    # One pass over every student first, so the runs measure warm lookups
+    for offset in range(0, len(ids), 1000):
+        reader, writer = await asyncio.open_connection(host, port)
+        await _request(reader, writer, "POST", "/students/scores",
+                       json.dumps({"student_ids": ids[offset:offset + 1000]}).encode())
+        writer.close()
+
+    print(f"{len(ids):,} students | {connections} connections | {seconds:g}s per scenario\n")
+    print(f"{'scenario':<24}{'requests':>10}{'req/s':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}{'errors':>8}")
+    for name, make_request in [("single lookup", single), (f"bulk lookup x{bulk_size}", bulk)]:
+        result = await run_scenario(host, port, make_request, connections, seconds)
+        print(f"{name:<24}{result['requests']:>10,}{result['requests_per_second']:>10,.0f}"
+              f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score service load test")
+    parser.add_argument("--url", help="running service to test (default: start one)")
+    parser.add_argument("--students", type=int, default=10_000,
+                        help="size of the generated data set when starting a service")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--bulk-size", type=int, default=100)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.url:
+        url = urlsplit(args.url)
+        asyncio.run(load_test(url.hostname, url.port or 80, args.connections,
+                              args.seconds, args.bulk_size))
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        data = generate_tutoring_data(columnar_path(os.path.join(workdir, "tutoring_data.csv")),
+                                      students=args.students)
+        service = subprocess.Popen([sys.executable, os.path.join(ROOT, "score_service.py"),
+                                    "--data", data, "--port", str(args.port),
+                                    "--refresh-seconds", "0"])
+        try:
+            asyncio.run(load_test("127.0.0.1", args.port, args.connections,
+                                  args.seconds, args.bulk_size))
+        finally:
+            service.terminate()
+            service.wait()
+
+
+if __name__ == "__main__":
+    main()
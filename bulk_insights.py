@@ -0,0 +1,252 @@
+"""
+Bulk AI insights through the Message Batches API
+
+Explaining a large at-risk cohort one `messages.create` call per student is
+slow and pays full price for near-identical prompts. Bulk mode instead:
+
+1. reduces each student to a metric profile (risk level, risk factors and
+   coarsely rounded metrics, without name or session rows),
+2. builds one explanation and one recommendations prompt per distinct
+   profile, so students who look alike share a generation,
+3. submits the distinct prompts as Message Batches (half the per-token price
+   of regular calls, no rate-limit juggling) and polls until they end,
+4. fans each response out to every student with that profile by writing it
+   into the response cache under the student's own dashboard prompt keys, so
+   opening any of them is a cache hit.
+
+`FakeBatchClient` mimics the batch endpoints locally (canned text, token
+counts estimated from prompt length) so the whole path runs without an API
+key. Driven by `python pregenerate_insights.py --bulk [--fake]`.
+"""
+
+import hashlib
+import time
+from types import SimpleNamespace
+
+import ai_insights
+
+BATCH_MAX_REQUESTS = 10_000  # requests per submitted batch (API limit is 100,000)
+POLL_SECONDS = 30
+BATCH_TIMEOUT_SECONDS = 24 * 3600  # batches expire after 24 hours
+CACHE_WRITE_BATCH = 10_000  # responses stored per cache transaction
+
+# Day ranges the inactivity metric is bucketed into
+INACTIVITY_BUCKETS = [(0, 7), (8, 14), (15, 30), (31, 60)]
+
+
+def _round_to(value, step):
+    return round(round(value / step) * step, 2)
+
+
+def _inactivity(days):
+    for low, high in INACTIVITY_BUCKETS:
+        if days <= high:
+            return f"{low}-{high} days"
+    return f"over {INACTIVITY_BUCKETS[-1][1]} days"
+
+
+def metric_profile(student_metrics):
+    """Coarse, anonymous description of a student; equal profiles share a prompt"""
+    return (
+        student_metrics['risk_level'],
+        tuple(student_metrics['risk_factors']),
+        _round_to(student_metrics['avg_engagement'], 0.5),
+        _round_to(student_metrics['engagement_trend'], 0.5),
+        _round_to(student_metrics['completion_rate'], 0.1),
+        _round_to(student_metrics['homework_rate'], 0.1),
+        _round_to(student_metrics['attendance_rate'], 0.1),
+        _inactivity(student_metrics['days_since_last']),
+    )
+
+
+def _profile_lines(profile):
+    risk_level, factors, engagement, trend, completion, homework, attendance, inactivity = profile
+    return f"""Risk Level: {risk_level}
+Risk Factors: {', '.join(factors) or 'none'}
+
+Metrics (rounded):
+- Average Engagement: about {engagement:.1f}/10
+- Engagement Trend: about {trend:+.1f} (recent vs early sessions)
+- Session Completion Rate: about {completion:.0%}
+- Homework Completion Rate: about {homework:.0%}
+- Attendance Rate: about {attendance:.0%} of expected sessions
+- Days Since Last Session: {inactivity}"""
+
+
+def profile_explanation_prompt(profile):
+    """Explanation prompt for every student sharing a profile"""
+    return f"""Analyze this at-risk tutoring student's profile and explain WHY they are at risk:
+
+{_profile_lines(profile)}
+
+Provide a concise 2-3 sentence explanation of the key risk factors and patterns. Refer to them as "this student"."""
+
+
+def profile_recommendations_prompt(profile):
+    """Recommendations prompt for every student sharing a profile"""
+    return f"""Based on this at-risk tutoring student's profile, recommend 3 specific interventions:
+
+{_profile_lines(profile)}
+
+Provide 3 actionable recommendations as a numbered list. Be specific and practical."""
+
+
+def plan_bulk(student_metrics, sessions, cache, model=ai_insights.MODEL):
+    """Group the students' explanation and recommendation work by profile prompt.
+
+    Returns {custom_id: {"prompt", "max_tokens", "keys"}}, where keys are the
+    dashboard cache keys the response is fanned out to, plus the number of
+    student prompts that were already cached.
+    """
+    requests = {}
+    already_cached = 0
+    for _, row in student_metrics.iterrows():
+        profile = metric_profile(row)
+        work = [
+            (profile_explanation_prompt(profile),
+             ai_insights.explanation_prompt(row, sessions.sessions_for(row['student_id'])),
+             ai_insights.EXPLANATION_MAX_TOKENS),
+            (profile_recommendations_prompt(profile),
+             ai_insights.recommendations_prompt(row),
+             ai_insights.RECOMMENDATIONS_MAX_TOKENS),
+        ]
+        for profile_prompt, student_prompt, max_tokens in work:
+            key = ai_insights.response_key(student_prompt, max_tokens, model)
+            if cache.peek(key):
+                already_cached += 1
+                continue
+            custom_id = "p-" + hashlib.sha256(profile_prompt.encode()).hexdigest()[:32]
+            request = requests.setdefault(custom_id, {"prompt": profile_prompt, "max_tokens": max_tokens,
+                                                      "keys": []})
+            request["keys"].append(key)
+    return requests, already_cached
+
+
+def run_batches(client, requests, model=ai_insights.MODEL, poll_seconds=POLL_SECONDS,
+                timeout=BATCH_TIMEOUT_SECONDS, batch_size=BATCH_MAX_REQUESTS, clock=time.monotonic,
+                sleep=time.sleep):
+    """Submit {custom_id: request} through the Message Batches API.
+
+    Yields (custom_id, text or None, usage or None) as each batch ends; text
+    is None for requests that errored, were canceled or expired.
+    """
+    ids = list(requests)
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        batch = client.messages.batches.create(requests=[
+            {
+                "custom_id": custom_id,
+                "params": {
+                    "model": model,
+                    "max_tokens": requests[custom_id]["max_tokens"],
+                    "messages": [{"role": "user", "content": requests[custom_id]["prompt"]}],
+                },
+            }
+            for custom_id in chunk
+        ])
+        deadline = clock() + timeout
+        while batch.processing_status != "ended":
+            if clock() > deadline:
+                client.messages.batches.cancel(batch.id)
+                raise TimeoutError(f"batch {batch.id} did not finish within {timeout:g}s")
+            sleep(poll_seconds)
+            batch = client.messages.batches.retrieve(batch.id)
+
+        for entry in client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                message = entry.result.message
+                yield entry.custom_id, message.content[0].text, message.usage
+            else:
+                yield entry.custom_id, None, None
+
+
+def bulk_generate(client, student_metrics, sessions, cache, model=ai_insights.MODEL, **batch_options):
+    """Generate and cache explanations and recommendations for a cohort in bulk.
+
+    sessions is anything with sessions_for(student_id) (e.g. a SessionIndex).
+    Returns counts of students, student prompts, distinct profile prompts,
+    generated, cached and failed student prompts, and the tokens used.
+    """
+    requests, already_cached = plan_bulk(student_metrics, sessions, cache, model)
+    summary = {
+        "students": len(student_metrics),
+        "student_prompts": sum(len(request["keys"]) for request in requests.values()) + already_cached,
+        "profile_prompts": len(requests),
+        "cached": already_cached,
+        "generated": 0,
+        "failed": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+    }
+
+    # Profiles answered by an earlier run only need fanning out. Writes are
+    # collected and stored in a few large transactions
+    writes = []
+    for custom_id in list(requests):
+        request = requests[custom_id]
+        text = cache.get(ai_insights.response_key(request["prompt"], request["max_tokens"], model))
+        if text is not None:
+            writes += [(key, text) for key in request["keys"]]
+            summary["cached"] += len(request["keys"])
+            del requests[custom_id]
+
+    for custom_id, text, usage in run_batches(client, requests, model, **batch_options):
+        request = requests[custom_id]
+        if text is None:
+            summary["failed"] += len(request["keys"])
+            continue
+        writes.append((ai_insights.response_key(request["prompt"], request["max_tokens"], model), text))
+        writes += [(key, text) for key in request["keys"]]
+        summary["generated"] += len(request["keys"])
+        summary["input_tokens"] += usage.input_tokens
+        summary["output_tokens"] += usage.output_tokens
+        if len(writes) >= CACHE_WRITE_BATCH:
+            cache.set_many(writes)
+            writes = []
+    cache.set_many(writes)
+    return summary
+
+
+class FakeBatchClient:
+    """Local stand-in for the Message Batches endpoints of an Anthropic client.
+
+    Batches end after `polls_until_done` retrieve calls; every request
+    succeeds with a canned response unless its custom_id is in `fail_ids`.
+    """
+
+    def __init__(self, polls_until_done=1, fail_ids=()):
+        self.messages = SimpleNamespace(batches=self)
+        self.polls_until_done = polls_until_done
+        self.fail_ids = set(fail_ids)
+        self.submitted = []  # requests of every created batch
+        self._batches = {}
+
+    def _batch(self, batch_id):
+        polls = self._batches[batch_id]["polls"]
+        return SimpleNamespace(id=batch_id,
+                               processing_status="ended" if polls >= self.polls_until_done else "in_progress")
+
+    def create(self, requests):
+        batch_id = f"msgbatch_fake_{len(self._batches) + 1}"
+        self._batches[batch_id] = {"requests": list(requests), "polls": 0}
+        self.submitted.append(self._batches[batch_id]["requests"])
+        return self._batch(batch_id)
+
+    def retrieve(self, batch_id):
+        self._batches[batch_id]["polls"] += 1
+        return self._batch(batch_id)
+
+    def cancel(self, batch_id):
+        return self._batch(batch_id)
+
+    def results(self, batch_id):
+        for request in self._batches[batch_id]["requests"]:
+            if request["custom_id"] in self.fail_ids:
+                yield SimpleNamespace(custom_id=request["custom_id"], result=SimpleNamespace(type="errored"))
+                continue
+            prompt = request["params"]["messages"][0]["content"]
+            text = f"[fake response {request['custom_id'][:10]}] " + prompt.splitlines()[0]
+            usage = SimpleNamespace(input_tokens=len(prompt) // 4, output_tokens=len(text) // 4)
+            message = SimpleNamespace(content=[SimpleNamespace(text=text)], usage=usage)
+            yield SimpleNamespace(custom_id=request["custom_id"],
+                                  result=SimpleNamespace(type="succeeded", message=message))
@@ -9,9 +9,29 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import anthropic
 import os
 
+import ai_insights
+import perf
+from ingest import DropDirectoryTailer, LiveScores
+from llm_cache import DEFAULT_CACHE_FILE, ResponseCache
+from llm_client import create_client
+from risk_engine import SCORING_VERSION, RiskMetricStore, decode_risk_factors
+from rollups import COHORT_DIMENSIONS, CohortRollup
+from scoring import generate_rule_based_explanation, generate_rule_based_recommendations, load_rule_set
+from session_index import SessionIndex
+from session_io import DEFAULT_DATA_FILE, data_version, load_sessions
+
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100]
+
+# Derived results kept per (data version, scoring version, day) and filter slices
+DERIVED_CACHE_ENTRIES = 4
+FILTER_CACHE_ENTRIES = 32
+
+# Set SESSION_DROP_DIR to fold session event files into the scores as they land
+SESSION_DROP_DIR = os.environ.get("SESSION_DROP_DIR")
+LIVE_POLL_SECONDS = float(os.environ.get("SESSION_POLL_SECONDS", "2"))
+
 # Page configuration
 st.set_page_config(
     page_title="Student Risk Dashboard",
@@ -51,16 +71,18 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-@st.cache_data
-def load_data():
-    """Load and preprocess tutoring data"""
+@st.cache_data(max_entries=2)
+def load_data(version=None):
+    """Load and preprocess tutoring data
+
+    `version` only keys the cache: pass data_version() so a changed file is
+    reloaded.
+    """
     try:
-        df = pd.read_csv("tutoring_data.csv")
-        df['session_date'] = pd.to_datetime(df['session_date'])
-        return df
+        return load_sessions(DEFAULT_DATA_FILE)
     except FileNotFoundError:
         st.warning("⚠️ tutoring_data.csv not found. Generating sample data...")
-        with st.spinner("Generating 75 students with 12 weeks of data... This will take ~10 seconds."):
+        with st.spinner("Generating 75 students with 12 weeks of data..."):
             try:
                 from generate_data import generate_tutoring_data
                 generate_tutoring_data()
@@ -74,224 +96,180 @@ def load_data():
                 st.stop()
 
 
-def calculate_risk_metrics(df):
-    """Calculate risk indicators for each student"""
-    student_metrics = []
-    
-    for student_id in df['student_id'].unique():
-        student_data = df[df['student_id'] == student_id].sort_values('session_date')
-        
-        # Calculate key metrics
-        total_sessions = len(student_data)
-        avg_engagement = student_data['engagement_score'].mean()
-        completion_rate = student_data['completed'].mean()
-        homework_rate = student_data['homework_completed'].mean()
-        
-        # Calculate engagement trend (last 4 weeks vs first 4 weeks)
-        recent_data = student_data.tail(8)
-        early_data = student_data.head(8)
-        engagement_trend = recent_data['engagement_score'].mean() - early_data['engagement_score'].mean()
-        
-        # Calculate attendance consistency
-        expected_sessions = 24  # 12 weeks * 2 sessions average
-        attendance_rate = total_sessions / expected_sessions
-        
-        # Days since last session
-        last_session = student_data['session_date'].max()
-        days_since_last = (datetime.now() - last_session).days
-        
-        # Risk scoring
-        risk_score = 0
-        risk_factors = []
-        
-        if avg_engagement < 5:
-            risk_score += 3
-            risk_factors.append("Low engagement")
-        elif avg_engagement < 7:
-            risk_score += 1
-            
-        if engagement_trend < -2:
-            risk_score += 3
-            risk_factors.append("Declining engagement")
-        elif engagement_trend < -1:
-            risk_score += 2
-            
-        if completion_rate < 0.7:
-            risk_score += 2
-            risk_factors.append("Low session completion")
-            
-        if homework_rate < 0.5:
-            risk_score += 2
-            risk_factors.append("Low homework completion")
-            
-        if attendance_rate < 0.6:
-            risk_score += 2
-            risk_factors.append("Poor attendance")
-            
-        if days_since_last > 14:
-            risk_score += 2
-            risk_factors.append("Inactive student")
-        
-        # Determine risk level
-        if risk_score >= 7:
-            risk_level = "High"
-        elif risk_score >= 4:
-            risk_level = "Medium"
-        else:
-            risk_level = "Low"
-        
-        student_metrics.append({
-            'student_id': student_id,
-            'student_name': student_data['student_name'].iloc[0],
-            'grade_level': student_data['grade_level'].iloc[0],
-            'risk_level': risk_level,
-            'risk_score': risk_score,
-            'avg_engagement': avg_engagement,
-            'engagement_trend': engagement_trend,
-            'completion_rate': completion_rate,
-            'homework_rate': homework_rate,
-            'attendance_rate': attendance_rate,
-            'total_sessions': total_sessions,
-            'days_since_last': days_since_last,
-            'risk_factors': risk_factors,
-            'last_session': last_session
-        })
-    
-    return pd.DataFrame(student_metrics)
+@st.cache_resource(max_entries=1)
+def get_session_index(_df, version):
+    """Per-student session index, built once per version of the data file"""
+    return SessionIndex(_df)
 
 
-def generate_ai_explanation(student_metrics, student_data):
-    """Generate AI explanation for why a student is at-risk using Claude"""
-    try:
-        # Try to get API key from Streamlit secrets first, then environment variable
-        api_key = st.secrets.get("ANTHROPIC_API_KEY") or os.environ.get("ANTHROPIC_API_KEY")
-        if not api_key:
-            return "⚠️ ANTHROPIC_API_KEY not set. Using rule-based explanation instead.\n\n" + generate_rule_based_explanation(student_metrics, student_data)
-        
-        client = anthropic.Anthropic(api_key=api_key)
-        
-        prompt = f"""Analyze this student's tutoring data and explain WHY they are at risk:
+@st.cache_resource
+def get_rule_set():
+    """Risk rules from the RISK_RULES_FILE JSON file, or the default rules"""
+    return load_rule_set(os.environ.get("RISK_RULES_FILE"))
 
-Student: {student_metrics['student_name']} (Grade {student_metrics['grade_level']})
-Risk Level: {student_metrics['risk_level']}
 
-Metrics:
-- Average Engagement: {student_metrics['avg_engagement']:.1f}/10
-- Engagement Trend: {student_metrics['engagement_trend']:.1f} (recent vs early)
-- Session Completion Rate: {student_metrics['completion_rate']:.0%}
-- Homework Completion Rate: {student_metrics['homework_rate']:.0%}
-- Attendance Rate: {student_metrics['attendance_rate']:.0%}
-- Total Sessions: {student_metrics['total_sessions']}
-- Days Since Last Session: {student_metrics['days_since_last']}
+@st.cache_resource
+def get_metric_store():
+    """Process-wide incremental risk metric store
 
-Recent Session Data:
-{student_data.tail(5)[['session_date', 'engagement_score', 'completed', 'homework_completed', 'subject']].to_string()}
+    Set RISK_SCORING_WORKERS to score large loads across several processes.
+    """
+    return RiskMetricStore(workers=int(os.environ.get("RISK_SCORING_WORKERS", "1")), rules=get_rule_set())
 
-Provide a concise 2-3 sentence explanation of the key risk factors and patterns you observe."""
 
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=300,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        return message.content[0].text
-    
-    except Exception as e:
-        return f"⚠️ AI explanation unavailable: {str(e)}\n\n" + generate_rule_based_explanation(student_metrics, student_data)
+@st.cache_resource(max_entries=1)
+def get_live_scores(_df, version):
+    """Scores kept current with the SESSION_DROP_DIR event files, per data file version
 
+    Events already in the directory are folded in straight away.
+    """
+    live = LiveScores(_df, DropDirectoryTailer(SESSION_DROP_DIR),
+                      workers=int(os.environ.get("RISK_SCORING_WORKERS", "1")), rules=get_rule_set())
+    live.poll()
+    return live
 
-def generate_rule_based_explanation(student_metrics, student_data):
-    """Fallback rule-based explanation"""
-    explanation = []
-    
-    if student_metrics['avg_engagement'] < 5:
-        explanation.append(f"Low average engagement score of {student_metrics['avg_engagement']:.1f}/10 indicates the student is not actively participating.")
-    
-    if student_metrics['engagement_trend'] < -2:
-        explanation.append(f"Engagement has declined significantly by {abs(student_metrics['engagement_trend']):.1f} points over the past weeks.")
-    
-    if student_metrics['completion_rate'] < 0.7:
-        explanation.append(f"Only {student_metrics['completion_rate']:.0%} of sessions are being completed.")
-    
-    if student_metrics['homework_rate'] < 0.5:
-        explanation.append(f"Homework completion rate is low at {student_metrics['homework_rate']:.0%}.")
-    
-    if student_metrics['attendance_rate'] < 0.6:
-        explanation.append(f"Attendance is inconsistent at {student_metrics['attendance_rate']:.0%} of expected sessions.")
-    
-    if student_metrics['days_since_last'] > 14:
-        explanation.append(f"Student has been inactive for {student_metrics['days_since_last']} days.")
-    
-    return " ".join(explanation) if explanation else "Student is performing well with no significant risk factors."
 
+@perf.timed()
+def calculate_risk_metrics(df, live=None):
+    """Calculate risk indicators for each student.
 
-def generate_ai_recommendations(student_metrics, student_data):
-    """Generate AI-powered intervention recommendations"""
-    try:
-        # Try to get API key from Streamlit secrets first, then environment variable
-        api_key = st.secrets.get("ANTHROPIC_API_KEY") or os.environ.get("ANTHROPIC_API_KEY")
-        if not api_key:
-            return generate_rule_based_recommendations(student_metrics)
-        
-        client = anthropic.Anthropic(api_key=api_key)
-        
-        prompt = f"""Based on this at-risk student's data, recommend 3 specific interventions:
+    Scores come from the shared RiskMetricStore (or the live scores when
+    ingesting), so a rerun on the same data reuses them and newly appended
+    sessions only re-score their students.
+    """
+    if live is not None:
+        return live.metrics()
+    return get_metric_store().sync(df)
 
-Student: {student_metrics['student_name']} (Grade {student_metrics['grade_level']})
-Risk Level: {student_metrics['risk_level']}
-Risk Factors: {', '.join(student_metrics['risk_factors'])}
 
-Key Metrics:
-- Avg Engagement: {student_metrics['avg_engagement']:.1f}/10
-- Engagement Trend: {student_metrics['engagement_trend']:.1f}
-- Completion Rate: {student_metrics['completion_rate']:.0%}
-- Homework Rate: {student_metrics['homework_rate']:.0%}
-- Attendance: {student_metrics['attendance_rate']:.0%}
+@st.cache_resource(max_entries=DERIVED_CACHE_ENTRIES)
+def get_ranked_metrics(_df, data_key, _live=None):
+    """Student metrics ranked by risk score, computed once per data key
 
-Provide 3 actionable recommendations as a numbered list. Be specific and practical."""
+    data_key is (data file version, ingested batches, scoring version, rule
+    set fingerprint, day).
+    The frame is shared by every session: slice it, never mutate it.
+    """
+    return calculate_risk_metrics(_df, _live).sort_values('risk_score', ascending=False, kind='stable')
 
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=400,
-            messages=[{"role": "user", "content": prompt}]
-        )
+
+@st.cache_resource(max_entries=DERIVED_CACHE_ENTRIES)
+def get_cohort_rollup(_df, _student_metrics, data_key, _live=None):
+    """Weekly cohort rollup of all sessions, built once per data key
+
+    When ingesting, the live scores maintain the rollup incrementally.
+    """
+    if _live is not None:
+        return _live.rollup
+    return CohortRollup.from_sessions(_df, _student_metrics.set_index('student_id')['risk_level'])
+
+
+@st.cache_resource(max_entries=DERIVED_CACHE_ENTRIES)
+def get_overview_charts(_rollup, _student_metrics, data_key):
+    """The three overview figures, built once per data key
+
+    st.plotly_chart serializes a copy of each figure, so sharing them across
+    sessions is safe.
+    """
+    return create_overview_charts(_rollup, _student_metrics)
+
+
+@st.cache_resource(max_entries=FILTER_CACHE_ENTRIES)
+def filter_students(_ranked_metrics, data_key, risk_levels, grade_levels):
+    """Rows of the ranked metrics matching the sidebar filters, still ranked"""
+    return _ranked_metrics[
+        (_ranked_metrics['risk_level'].isin(risk_levels)) &
+        (_ranked_metrics['grade_level'].isin(grade_levels))
+    ]
+
+
+@st.cache_resource
+def get_response_cache():
+    """Disk-backed LLM response cache shared by all sessions"""
+    return ResponseCache(DEFAULT_CACHE_FILE)
+
+
+@st.cache_resource
+def get_llm_client():
+    """Process-wide Anthropic client, or None when no API key is configured
+
+    Reusing one client keeps its connection pool alive; the wrapper caps
+    concurrent requests and records latency and token usage.
+    """
+    # Try to get API key from Streamlit secrets first, then environment variable
+    try:
+        api_key = st.secrets.get("ANTHROPIC_API_KEY")
+    except FileNotFoundError:  # no secrets.toml
+        api_key = None
+    api_key = api_key or os.environ.get("ANTHROPIC_API_KEY")
+    return create_client(api_key) if api_key else None
+
+
+def stream_ai_explanation(student_metrics, student_data):
+    """Stream an AI explanation for why a student is at-risk using Claude
+
+    Falls back to the rule-based explanation if the call fails or the stream
+    stalls past its deadline.
+    """
+    streamed = False
+    with perf.span("ai_explanation"):
+        try:
+            client = get_llm_client()
+            if client is None:
+                perf.count("ai_explanation_fallback")
+                yield "⚠️ ANTHROPIC_API_KEY not set. Using rule-based explanation instead.\n\n" + generate_rule_based_explanation(student_metrics, student_data, get_rule_set())
+                return
+            
+            for chunk in ai_insights.stream_explanation(client, student_metrics, student_data,
+                                                        cache=get_response_cache()):
+                streamed = True
+                yield chunk
         
-        return message.content[0].text
-    
-    except Exception as e:
-        return generate_rule_based_recommendations(student_metrics)
+        except ai_insights.StreamStalled as e:
+            perf.count("ai_explanation_fallback")
+            yield ("\n\n" if streamed else "") + f"⚠️ {str(e)}. Using rule-based explanation instead.\n\n" + generate_rule_based_explanation(student_metrics, student_data, get_rule_set())
+        except Exception as e:
+            perf.count("ai_explanation_fallback")
+            yield ("\n\n" if streamed else "") + f"⚠️ AI explanation unavailable: {str(e)}\n\n" + generate_rule_based_explanation(student_metrics, student_data, get_rule_set())
+
+
+def stream_ai_recommendations(student_metrics, student_data):
+    """Stream AI-powered intervention recommendations
+
+    Falls back to rule-based recommendations if the call fails or stalls.
+    """
+    streamed = False
+    with perf.span("ai_recommendations"):
+        try:
+            client = get_llm_client()
+            if client is None:
+                perf.count("ai_recommendations_fallback")
+                yield generate_rule_based_recommendations(student_metrics, get_rule_set())
+                return
+            
+            for chunk in ai_insights.stream_recommendations(client, student_metrics,
+                                                            cache=get_response_cache()):
+                streamed = True
+                yield chunk
+        
+        except Exception as e:
+            perf.count("ai_recommendations_fallback")
+            yield ("\n\n" if streamed else "") + generate_rule_based_recommendations(student_metrics, get_rule_set())
 
 
-def generate_rule_based_recommendations(student_metrics):
-    """Fallback rule-based recommendations"""
-    recommendations = []
-    
-    if student_metrics['days_since_last'] > 14:
-        recommendations.append("📞 **Immediate Outreach**: Contact student/parent to re-engage and understand barriers to attendance.")
-    
-    if student_metrics['avg_engagement'] < 5:
-        recommendations.append("🎯 **Tutor Match Review**: Consider matching with a different tutor who specializes in engagement strategies.")
-    
-    if student_metrics['homework_rate'] < 0.5:
-        recommendations.append("📚 **Homework Support Plan**: Implement a structured homework completion system with shorter, more manageable assignments.")
-    
-    if student_metrics['engagement_trend'] < -2:
-        recommendations.append("🔍 **Root Cause Analysis**: Schedule a meeting with tutor, student, and parent to identify underlying issues causing declining engagement.")
-    
-    if student_metrics['attendance_rate'] < 0.6:
-        recommendations.append("📅 **Schedule Optimization**: Work with family to find more convenient session times and reduce scheduling conflicts.")
-    
-    if student_metrics['completion_rate'] < 0.7:
-        recommendations.append("⏰ **Session Structure Review**: Adjust session length or format to improve completion rates.")
-    
-    # Return top 3 recommendations
-    return "\n\n".join(recommendations[:3]) if recommendations else "Continue monitoring student progress."
+def render_stream(kind, chunks):
+    """Render streamed text into a single st.info/st.success element"""
+    placeholder = st.empty()
+    text = ""
+    for chunk in chunks:
+        text += chunk
+        getattr(placeholder, kind)(text)
+    return text
 
 
-def create_engagement_trend_chart(df, student_id):
-    """Create engagement trend visualization for a student"""
-    student_data = df[df['student_id'] == student_id].sort_values('session_date')
+@perf.timed()
+def create_engagement_trend_chart(student_data):
+    """Create engagement trend visualization for a student's date-ordered sessions"""
     
     fig = go.Figure()
     
@@ -304,16 +282,19 @@ def create_engagement_trend_chart(df, student_id):
         marker=dict(size=8)
     ))
     
-    # Add trend line
-    z = np.polyfit(range(len(student_data)), student_data['engagement_score'], 1)
-    p = np.poly1d(z)
-    fig.add_trace(go.Scatter(
-        x=student_data['session_date'],
-        y=p(range(len(student_data))),
-        mode='lines',
-        name='Trend',
-        line=dict(color='#FF5722', width=2, dash='dash')
-    ))
+    # Add trend line (a new student may have only one scored session)
+    scored = student_data['engagement_score'].notna().to_numpy()
+    if scored.sum() >= 2:
+        x = np.arange(len(student_data))
+        z = np.polyfit(x[scored], student_data['engagement_score'].to_numpy(dtype=float)[scored], 1)
+        p = np.poly1d(z)
+        fig.add_trace(go.Scatter(
+            x=student_data['session_date'],
+            y=p(x),
+            mode='lines',
+            name='Trend',
+            line=dict(color='#FF5722', width=2, dash='dash')
+        ))
     
     fig.update_layout(
         title="Engagement Score Over Time",
@@ -327,8 +308,9 @@ def create_engagement_trend_chart(df, student_id):
     return fig
 
 
-def create_overview_charts(df, student_metrics):
-    """Create overview visualizations"""
+@perf.timed()
+def create_overview_charts(rollup, student_metrics):
+    """Create overview visualizations from the student metrics and cohort rollup"""
     
     # Risk distribution
     risk_counts = student_metrics['risk_level'].value_counts()
@@ -351,14 +333,14 @@ def create_overview_charts(df, student_metrics):
         category_orders={'risk_level': ['High', 'Medium', 'Low']}
     )
     
-    # Weekly engagement trends
-    df['week'] = df['session_date'].dt.isocalendar().week
-    weekly_engagement = df.groupby('week')['engagement_score'].mean().reset_index()
+    # Weekly engagement trends (ISO weeks, so years don't fold together)
+    weekly_engagement = rollup.weekly()
     fig_weekly = px.line(
         weekly_engagement,
-        x='week',
-        y='engagement_score',
+        x='week_start',
+        y='avg_engagement',
         title="Average Engagement Score by Week",
+        labels={'week_start': 'week', 'avg_engagement': 'engagement_score'},
         markers=True
     )
     fig_weekly.update_layout(yaxis=dict(range=[0, 10]))
@@ -368,6 +350,7 @@ def create_overview_charts(df, student_metrics):
 
 def main():
     """Main dashboard application"""
+    run_timings = perf.start_run()
     
     # Header
     st.title("📊 AI-Powered Student Risk Dashboard")
@@ -375,8 +358,24 @@ def main():
     st.markdown("---")
     
     # Load data
-    df = load_data()
-    student_metrics = calculate_risk_metrics(df)
+    version = data_version(DEFAULT_DATA_FILE)
+    with perf.span("load_data"):
+        df = load_data(version)
+    live = None
+    if SESSION_DROP_DIR:
+        with perf.span("live_scores"):
+            live = get_live_scores(df, version)
+    with perf.span("session_index"):
+        sessions = live if live is not None else get_session_index(df, version)
+    
+    # Derived results are cached per data version, ingested batch, scoring
+    # code and rules and day (days_since_last moves with the date); filters
+    # only re-slice them
+    live_version = live.version if live is not None else 0
+    data_key = (version, live_version, SCORING_VERSION, get_rule_set().fingerprint,
+                datetime.now().date().isoformat())
+    with perf.span("student_metrics"):
+        student_metrics = get_ranked_metrics(df, data_key, live)
     
     # Sidebar filters
     st.sidebar.header("🔍 Filters")
@@ -392,11 +391,27 @@ def main():
         default=sorted(student_metrics['grade_level'].unique())
     )
     
+    if live is not None:
+        with st.sidebar:
+            watch_live_scores(live, live_version)
+        render_risk_changes(live)
+    
+    show_perf_panel = st.sidebar.toggle("⏱️ Performance panel", value=False)
+    
+    llm_client = get_llm_client()
+    if llm_client is not None and llm_client.metrics.calls:
+        llm_stats = llm_client.metrics.snapshot()
+        st.sidebar.caption(
+            f"🤖 Claude latency p50 {llm_stats['p50_seconds']:.1f}s · p95 {llm_stats['p95_seconds']:.1f}s "
+            f"over {llm_stats['calls']} calls · {llm_stats['input_tokens'] + llm_stats['output_tokens']:,} tokens"
+        )
+        if llm_stats['ttft_p50_seconds'] is not None:
+            st.sidebar.caption(
+                f"⚡ First token p50 {llm_stats['ttft_p50_seconds']:.1f}s · p95 {llm_stats['ttft_p95_seconds']:.1f}s"
+            )
+    
     # Apply filters
-    filtered_metrics = student_metrics[
-        (student_metrics['risk_level'].isin(risk_filter)) &
-        (student_metrics['grade_level'].isin(grade_filter))
-    ].sort_values('risk_score', ascending=False)
+    filtered_metrics = filter_students(student_metrics, data_key, tuple(risk_filter), tuple(grade_filter))
     
     # Overview metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -418,7 +433,10 @@ def main():
     # Visualizations
     st.header("📈 Overview Analytics")
     
-    fig_risk, fig_engagement, fig_weekly = create_overview_charts(df, student_metrics)
+    with perf.span("cohort_rollup"):
+        rollup = get_cohort_rollup(df, student_metrics, data_key, live)
+    with perf.span("overview_charts"):
+        fig_risk, fig_engagement, fig_weekly = get_overview_charts(rollup, student_metrics, data_key)
     
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -428,62 +446,189 @@ def main():
     with col3:
         st.plotly_chart(fig_weekly, use_container_width=True)
     
+    # Cohort drill-down, read from the rollup and narrowed by the sidebar filters
+    with st.expander("🔎 Cohort drill-down"):
+        dimension = st.selectbox("Group by", list(COHORT_DIMENSIONS), format_func=COHORT_DIMENSIONS.get)
+        cohorts = rollup.breakdown(dimension, risk_levels=risk_filter, grade_levels=grade_filter)
+        st.dataframe(
+            cohorts.rename(columns={
+                dimension: COHORT_DIMENSIONS[dimension],
+                'sessions': 'Sessions',
+                'avg_engagement': 'Avg Engagement',
+                'completion_rate': 'Completion',
+                'homework_rate': 'Homework',
+            }).round(2),
+            use_container_width=True,
+            hide_index=True
+        )
+    
     st.markdown("---")
     
     # Student list
     st.header("👥 At-Risk Students")
-    st.markdown(f"Showing **{len(filtered_metrics)}** students")
     
-    # Display students
-    for idx, row in filtered_metrics.iterrows():
-        risk_class = f"risk-{row['risk_level'].lower()}"
+    # Only one page of students is listed and only the selected student's
+    # chart, sessions and AI actions are built
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("Students per page", PAGE_SIZE_OPTIONS, index=1)
+    page_count = max(1, -(-len(filtered_metrics) // page_size))
+    with col2:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+    first = (page - 1) * page_size
+    page_metrics = filtered_metrics.iloc[first:first + page_size]
+    
+    st.markdown(f"Showing **{first + 1 if len(page_metrics) else 0}–{first + len(page_metrics)}** of **{len(filtered_metrics)}** students")
+    labels = {row['student_id']: student_label(row) for _, row in page_metrics.iterrows()}
+    st.dataframe(student_table(page_metrics, labels), use_container_width=True, hide_index=True)
+    
+    if labels:
+        student_id = st.selectbox("View student", options=list(labels), format_func=labels.get)
+        row = page_metrics.loc[page_metrics['student_id'] == student_id].iloc[0]
+        render_student_detail(row, sessions)
+    
+    if show_perf_panel:
+        render_perf_panel(run_timings)
+
+
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+def watch_live_scores(live, shown_version):
+    """Poll the drop directory and rerun the page once new sessions are scored"""
+    with perf.span("live_poll"):
+        live.poll()
+    if live.version != shown_version:
+        st.rerun()
+    last = f" · last at {live.last_ingested_at:%H:%M:%S}" if live.last_ingested_at is not None else ""
+    st.caption(f"📡 Live: {live.events_ingested:,} sessions ingested{last}")
+
+
+def render_risk_changes(live):
+    """Sidebar list of the latest risk level changes from ingested sessions"""
+    changes = list(live.recent_changes)
+    if not changes:
+        return
+    with st.sidebar.expander(f"🔔 Risk changes ({len(changes)})"):
+        for change in changes[:10]:
+            st.markdown(f"- **{change['student_id']}**: {change['old_level'] or 'New'} → "
+                        f"{change['new_level']} ({change['changed_at'][11:19]})")
+
+
+def render_perf_panel(run_timings):
+    """Sidebar panel with this rerun's timings and process-wide LLM stats"""
+    with st.sidebar.expander("⏱️ Performance", expanded=True):
+        st.caption("This rerun")
+        st.dataframe(
+            pd.DataFrame({
+                'Span': [name for name, _ in run_timings],
+                'ms': [round(seconds * 1000, 1) for _, seconds in run_timings],
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
         
-        with st.expander(f"{'🔴' if row['risk_level']=='High' else '🟡' if row['risk_level']=='Medium' else '🟢'} {row['student_name']} - Grade {row['grade_level']} - **{row['risk_level']} Risk**"):
-            
-            # Metrics
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("Engagement", f"{row['avg_engagement']:.1f}/10")
-            with col2:
-                st.metric("Completion", f"{row['completion_rate']:.0%}")
-            with col3:
-                st.metric("Homework", f"{row['homework_rate']:.0%}")
-            with col4:
-                st.metric("Attendance", f"{row['attendance_rate']:.0%}")
-            
-            # Engagement trend chart
-            student_data = df[df['student_id'] == row['student_id']]
-            fig = create_engagement_trend_chart(df, row['student_id'])
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Risk Factors
-            if row['risk_factors']:
-                st.subheader("⚠️ Risk Factors")
-                for factor in row['risk_factors']:
-                    st.markdown(f"- {factor}")
-            
-            # AI Explanation - Only generate when button is clicked
-            st.subheader("🤖 AI Analysis: Why is this student at-risk?")
-            if st.button("Generate AI Explanation", key=f"explain_{row['student_id']}"):
-                with st.spinner("Generating AI explanation..."):
-                    explanation = generate_ai_explanation(row, student_data)
-                    st.info(explanation)
-            
-            # AI Recommendations - Only generate when button is clicked
-            st.subheader("💡 Recommended Interventions")
-            if st.button("Generate AI Recommendations", key=f"recommend_{row['student_id']}"):
-                with st.spinner("Generating recommendations..."):
-                    recommendations = generate_ai_recommendations(row, student_data)
-                    st.success(recommendations)
-            
-            # Recent sessions
-            st.subheader("📅 Recent Sessions")
-            recent_sessions = student_data.sort_values('session_date', ascending=False).head(5)
-            st.dataframe(
-                recent_sessions[['session_date', 'subject', 'engagement_score', 'completed', 'homework_completed']],
-                use_container_width=True,
-                hide_index=True
+        spans = perf.REGISTRY.snapshot()['spans']
+        st.caption("Since start")
+        st.dataframe(
+            pd.DataFrame({
+                'Span': list(spans),
+                'Count': [stats['count'] for stats in spans.values()],
+                'p50 ms': [round(stats['p50_seconds'] * 1000, 1) for stats in spans.values()],
+                'p95 ms': [round(stats['p95_seconds'] * 1000, 1) for stats in spans.values()],
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+        
+        cache_stats = get_response_cache().stats()
+        st.caption(
+            f"🗄️ LLM cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%}) · {cache_stats['entries']:,} entries · "
+            f"{cache_stats['evictions']} evicted"
+        )
+        llm_client = get_llm_client()
+        llm_stats = llm_client.metrics.snapshot() if llm_client is not None else None
+        if llm_stats is not None and llm_stats['calls']:
+            st.caption(
+                f"🤖 Claude: {llm_stats['calls']} calls · {llm_stats['errors']} errors · "
+                f"p50 {llm_stats['p50_seconds']:.1f}s · p95 {llm_stats['p95_seconds']:.1f}s"
             )
+        
+        st.download_button(
+            "Download metrics (Prometheus)",
+            perf.prometheus_text(llm_metrics=llm_stats, cache_stats=cache_stats),
+            file_name="dashboard_metrics.prom",
+            mime="text/plain"
+        )
+
+
+def student_label(row, emphasize=False):
+    """One-line label for a student, prefixed with the risk colour"""
+    icon = '🔴' if row['risk_level'] == 'High' else '🟡' if row['risk_level'] == 'Medium' else '🟢'
+    risk = f"**{row['risk_level']} Risk**" if emphasize else f"{row['risk_level']} Risk"
+    return f"{icon} {row['student_name']} - Grade {row['grade_level']} - {risk}"
+
+
+def student_table(page_metrics, labels):
+    """Compact summary table for one page of students"""
+    return pd.DataFrame({
+        'Student': [labels[student_id] for student_id in page_metrics['student_id']],
+        'Score': page_metrics['risk_score'].to_numpy(),
+        'Engagement': page_metrics['avg_engagement'].map("{:.1f}/10".format).to_numpy(),
+        'Completion': page_metrics['completion_rate'].map("{:.0%}".format).to_numpy(),
+        'Homework': page_metrics['homework_rate'].map("{:.0%}".format).to_numpy(),
+        'Attendance': page_metrics['attendance_rate'].map("{:.0%}".format).to_numpy(),
+        'Days Inactive': page_metrics['days_since_last'].to_numpy(),
+    })
+
+
+def render_student_detail(row, sessions):
+    """Detail view for the student being viewed"""
+    # Risk factors are kept as a bitmask; labels are only needed from here on
+    row = decode_risk_factors(row, get_rule_set())
+    with st.expander(student_label(row, emphasize=True), expanded=True):
+        
+        # Metrics
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Engagement", f"{row['avg_engagement']:.1f}/10")
+        with col2:
+            st.metric("Completion", f"{row['completion_rate']:.0%}")
+        with col3:
+            st.metric("Homework", f"{row['homework_rate']:.0%}")
+        with col4:
+            st.metric("Attendance", f"{row['attendance_rate']:.0%}")
+        
+        # Engagement trend chart
+        student_data = sessions.sessions_for(row['student_id'])
+        fig = create_engagement_trend_chart(student_data)
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # Risk Factors
+        if row['risk_factors']:
+            st.subheader("⚠️ Risk Factors")
+            for factor in row['risk_factors']:
+                st.markdown(f"- {factor}")
+        
+        # AI Explanation - Only generate when button is clicked
+        st.subheader("🤖 AI Analysis: Why is this student at-risk?")
+        if st.button("Generate AI Explanation", key=f"explain_{row['student_id']}"):
+            with st.spinner("Generating AI explanation..."):
+                render_stream("info", stream_ai_explanation(row, student_data))
+        
+        # AI Recommendations - Only generate when button is clicked
+        st.subheader("💡 Recommended Interventions")
+        if st.button("Generate AI Recommendations", key=f"recommend_{row['student_id']}"):
+            with st.spinner("Generating recommendations..."):
+                render_stream("success", stream_ai_recommendations(row, student_data))
+        
+        # Recent sessions
+        st.subheader("📅 Recent Sessions")
+        recent_sessions = student_data.iloc[::-1].head(5)
+        st.dataframe(
+            recent_sessions[['session_date', 'subject', 'engagement_score', 'completed', 'homework_completed']],
+            use_container_width=True,
+            hide_index=True
+        )
 
 
 if __name__ == "__main__":
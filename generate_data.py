@@ -1,53 +1,109 @@
 # generate_data.py
-import pandas as pd
+"""
+Synthetic tutoring session generator
+
+Each student follows one of four archetypes (thriving, stable, declining,
+struggling) that sets their engagement level and sessions per week; a
+declining student's engagement drops 0.6 points a week. Sessions are drawn
+with NumPy a chunk of students at a time and streamed to CSV, or to columnar
+Parquet when the output file ends with .parquet, so load-test data sets of
+tens of millions of sessions can be produced:
+
+    python generate_data.py                                # 75 students, 12 weeks
+    python generate_data.py sessions.parquet --students 500000
+"""
+
+import argparse
+
 import numpy as np
-from datetime import datetime, timedelta
-import random
-
-
-def generate_tutoring_data(output_file="tutoring_data.csv"):
-    """Generate sample tutoring data for 75 students over 12 weeks"""
-    np.random.seed(42)
-    random.seed(42)
-
-    data = []
-    start_date = datetime(2025, 1, 6)
-    subjects = ["Math - Algebra", "Math - Geometry", "English - Writing",
-                "Science - Biology", "History - US History"]
-    names = ["Alex", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Avery",
-             "Quinn", "Parker", "Reese"] * 8
-
-    for i in range(75):
-        archetype = random.choice(["thriving", "stable", "declining", "struggling"])
-        base_engagement = {"thriving": 9, "stable": 7, "declining": 8, "struggling": 4}[archetype]
-        sessions_per_week = {"thriving": 3, "stable": 2, "declining": 2, "struggling": 1}[archetype]
-        
-        for week in range(12):
-            engagement = base_engagement
-            if archetype == "declining":
-                engagement = max(2, base_engagement - week * 0.6)
-            
-            for _ in range(sessions_per_week if random.random() > 0.2 else sessions_per_week - 1):
-                data.append({
-                    "student_id": f"STU-{i+1:03d}",
-                    "student_name": names[i],
-                    "grade_level": random.randint(6, 10),
-                    "session_date": (start_date + timedelta(weeks=week, days=random.randint(0, 6))).strftime("%Y-%m-%d"),
-                    "session_duration_minutes": random.choice([30, 45, 60]),
-                    "subject": random.choice(subjects),
-                    "tutor_id": f"TUT-{random.randint(101, 125)}",
-                    "completed": random.random() > 0.1,
-                    "engagement_score": int(engagement) + random.randint(-1, 1),
-                    "tutor_notes": f"Session notes here. Student engagement: {int(engagement)}/10",
-                    "homework_completed": random.random() > 0.3,
-                    "sessions_this_week": sessions_per_week,
-                    "total_sessions": week * sessions_per_week + 1
-                })
-
-    pd.DataFrame(data).to_csv(output_file, index=False)
-    print(f"✅ Generated {output_file} with {len(data)} sessions for 75 students")
+import pandas as pd
+
+from session_io import write_session_batches
+
+ARCHETYPES = ["thriving", "stable", "declining", "struggling"]
+BASE_ENGAGEMENT = np.array([9, 7, 8, 4])  # per archetype
+SESSIONS_PER_WEEK = np.array([3, 2, 2, 1])  # per archetype
+DECLINE_PER_WEEK = 0.6
+MIN_DECLINING_ENGAGEMENT = 2
+MISSED_SESSION_PROBABILITY = 0.2  # chance a week has one session fewer
+
+START_DATE = np.datetime64("2025-01-06")
+SUBJECTS = ["Math - Algebra", "Math - Geometry", "English - Writing",
+            "Science - Biology", "History - US History"]
+NAMES = ["Alex", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Avery",
+         "Quinn", "Parker", "Reese"]
+DURATIONS = np.array([30, 45, 60])
+NOTES = [f"Session notes here. Student engagement: {score}/10" for score in range(11)]
+
+CHUNK_STUDENTS = 100_000  # students generated (and held in memory) per batch
+
+
+def _generate_chunk(rng, first_student, students, weeks, tutors):
+    """Sessions for students first_student .. first_student + students - 1"""
+    archetype = rng.integers(0, len(ARCHETYPES), students)
+    sessions_per_week = SESSIONS_PER_WEEK[archetype]
+
+    # Sessions per (student, week), then one row per session
+    counts = sessions_per_week[:, None] - (rng.random((students, weeks)) <= MISSED_SESSION_PROBABILITY)
+    student = np.repeat(np.repeat(np.arange(students), weeks), counts.ravel())
+    week = np.repeat(np.tile(np.arange(weeks), students), counts.ravel())
+    n = len(student)
+
+    engagement = BASE_ENGAGEMENT[archetype][student].astype(float)
+    declining = archetype[student] == ARCHETYPES.index("declining")
+    engagement[declining] = np.maximum(MIN_DECLINING_ENGAGEMENT,
+                                       engagement[declining] - week[declining] * DECLINE_PER_WEEK)
+    engagement = engagement.astype(int)
+
+    student_number = first_student + np.arange(students)
+    student_ids = pd.Index([f"STU-{i + 1:03d}" for i in student_number])
+    tutor_ids = [f"TUT-{101 + t}" for t in range(tutors)]
+
+    return pd.DataFrame({
+        "student_id": pd.Categorical.from_codes(student, student_ids),
+        "student_name": pd.Categorical.from_codes((student_number % len(NAMES))[student], NAMES),
+        "grade_level": rng.integers(6, 11, n),
+        "session_date": START_DATE + week * 7 + rng.integers(0, 7, n),
+        "session_duration_minutes": DURATIONS[rng.integers(0, len(DURATIONS), n)],
+        "subject": pd.Categorical.from_codes(rng.integers(0, len(SUBJECTS), n), SUBJECTS),
+        "tutor_id": pd.Categorical.from_codes(rng.integers(0, tutors, n), tutor_ids),
+        "completed": rng.random(n) > 0.1,
+        "engagement_score": engagement + rng.integers(-1, 2, n),
+        "tutor_notes": pd.Categorical.from_codes(engagement, NOTES),
+        "homework_completed": rng.random(n) > 0.3,
+        "sessions_this_week": sessions_per_week[student],
+        "total_sessions": week * sessions_per_week[student] + 1,
+    })
+
+
+def generate_tutoring_data(output_file="tutoring_data.csv", students=75, weeks=12, tutors=25,
+                           seed=42, chunk_students=CHUNK_STUDENTS):
+    """Generate synthetic tutoring data for `students` students over `weeks` weeks
+
+    Writes CSV, or columnar Parquet when output_file ends with .parquet
+    """
+    rng = np.random.default_rng(seed)
+    total = 0
+
+    def chunks():
+        nonlocal total
+        for first in range(0, max(students, 1), chunk_students):
+            chunk = _generate_chunk(rng, first, min(chunk_students, students - first), weeks, tutors)
+            total += len(chunk)
+            yield chunk
+
+    write_session_batches(chunks(), output_file)
+    print(f"✅ Generated {output_file} with {total:,} sessions for {students:,} students")
     return output_file
 
 
 if __name__ == "__main__":
-    generate_tutoring_data()
+    parser = argparse.ArgumentParser(description="Generate synthetic tutoring sessions")
+    parser.add_argument("output_file", nargs="?", default="tutoring_data.csv")
+    parser.add_argument("--students", type=int, default=75)
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--tutors", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    generate_tutoring_data(args.output_file, args.students, args.weeks, args.tutors, args.seed)
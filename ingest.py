@@ -0,0 +1,332 @@
+# ingest.py
+"""
+Near real-time session ingestion
+
+Tails a drop directory of session event files (JSON Lines or CSV, one session
+per line) and folds new events into the risk scores in micro-batches: only
+the students in a batch are re-scored, the cohort rollup is updated in place
+and every student whose risk level changed is published to subscribers. Each
+file is read from where the previous poll stopped and a partially written
+last line is left for the next poll, so writers can simply append.
+
+Run standalone to print risk changes as JSON lines (or append them to a file):
+
+    python ingest.py session_events/ --data tutoring_data.csv --changes risk_changes.jsonl
+
+The dashboard does the same when SESSION_DROP_DIR is set.
+"""
+
+import argparse
+import glob
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from risk_engine import SESSION_COLUMNS, RiskMetricStore
+from risk_rules import load_rule_set
+from rollups import CohortRollup
+from session_index import SessionIndex
+from session_io import DASHBOARD_COLUMNS, DEFAULT_DATA_FILE, load_sessions
+
+logger = logging.getLogger("ingest")
+
+EVENT_PATTERNS = ("*.jsonl", "*.csv")
+POLL_SECONDS = 2
+RECENT_CHANGES = 50  # risk changes kept for display
+
+
+def normalize_events(events):
+    """Coerce parsed events to the session frame's columns and dtypes.
+
+    Rows missing a student id or session date are dropped; a missing
+    optional column is filled with NaN.
+    """
+    missing = [c for c in ('student_id', 'session_date') if c not in events.columns]
+    if missing:
+        raise ValueError(f"session events are missing {', '.join(missing)}")
+    events = events.reindex(columns=DASHBOARD_COLUMNS).dropna(subset=['student_id'])
+    events['student_id'] = events['student_id'].astype(str)
+    events['session_date'] = pd.to_datetime(events['session_date'], errors='coerce')
+    for column in ('engagement_score', 'grade_level'):
+        events[column] = pd.to_numeric(events[column], errors='coerce')
+    for column in ('completed', 'homework_completed'):
+        events[column] = events[column].map(
+            lambda value: str(value).strip().lower() in ('true', '1', 'yes') if pd.notna(value) else np.nan)
+    return events.dropna(subset=['student_id', 'session_date']).reset_index(drop=True)
+
+
+class DropDirectoryTailer:
+    """Reads the lines appended to a directory's event files since the last poll"""
+
+    def __init__(self, directory, patterns=EVENT_PATTERNS):
+        self.directory = directory
+        self.patterns = patterns
+        self.offsets = {}  # path -> bytes consumed
+        self._csv_headers = {}
+        self._lock = threading.Lock()  # one poll at a time, so no bytes are read twice
+
+    def _files(self):
+        paths = {path for pattern in self.patterns
+                 for path in glob.glob(os.path.join(self.directory, pattern))}
+        return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+    def _read_new_lines(self, path):
+        size = os.path.getsize(path)
+        offset = self.offsets.get(path, 0)
+        if size < offset:  # truncated or replaced: start over
+            logger.warning("%s shrank; re-reading it from the start", path)
+            offset = 0
+            self._csv_headers.pop(path, None)
+        if size == offset:
+            return b""
+        with open(path, "rb") as events_file:
+            events_file.seek(offset)
+            data = events_file.read(size - offset)
+        complete = data.rfind(b"\n") + 1
+        self.offsets[path] = offset + complete
+        return data[:complete]
+
+    def _parse(self, path, data):
+        if path.endswith(".jsonl"):
+            return pd.read_json(io.BytesIO(data), lines=True, dtype=False)
+        if path not in self._csv_headers:
+            header, _, data = data.partition(b"\n")
+            self._csv_headers[path] = header.decode().strip().split(",")
+            if not data:
+                return None
+        return pd.read_csv(io.BytesIO(data), names=self._csv_headers[path], header=None)
+
+    def poll(self):
+        """New events from every file as one normalized frame (None if there are none)"""
+        with self._lock:
+            return self._poll()
+
+    def _poll(self):
+        frames = []
+        for path in self._files():
+            data = self._read_new_lines(path)
+            if not data.strip():
+                continue
+            try:
+                events = self._parse(path, data)
+                if events is not None and len(events):
+                    frames.append(normalize_events(events))
+            except ValueError as e:
+                logger.error("Skipping unreadable events in %s: %s", path, e)
+        frames = [frame for frame in frames if len(frame)]
+        return pd.concat(frames, ignore_index=True) if frames else None
+
+
+class LiveScores:
+    """Scores, cohort rollup and session history kept current with new events.
+
+    Starts from a session export (scored once) and folds event batches in.
+    Subscribers are called with the list of risk changes of every batch that
+    has any, and of the re-scoring on the first call of a new day (students
+    drift into inactivity without any new events); each change is a dict with student_id, old_level (None for a new
+    student), new_level, risk_score and changed_at.
+    """
+
+    def __init__(self, sessions, tailer=None, now=None, workers=1, rules=None):
+        self.tailer = tailer
+        self.store = RiskMetricStore(workers=workers, rules=rules)
+        metrics = self.store.sync(sessions, now)
+        self.index = SessionIndex(sessions)
+        self.rollup = CohortRollup.from_sessions(sessions, metrics.set_index('student_id')['risk_level'])
+        self.version = 0  # bumped by every ingested batch
+        self.events_ingested = 0
+        self.last_ingested_at = None
+        self.recent_changes = deque(maxlen=RECENT_CHANGES)
+        self.subscribers = []
+        self._live = []  # ingested event frames
+        self._levels = dict(zip(metrics['student_id'], metrics['risk_level']))
+        self._day = pd.Timestamp(now if now is not None else datetime.now()).date()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._levels)
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def sessions_for(self, student_id):
+        """A student's sessions, export and ingested, in date order"""
+        with self._lock:
+            history = self.index.sessions_for(student_id)
+            live = [frame[frame['student_id'] == student_id] for frame in self._live]
+        # Columns an event left out stay NaN without deciding the dtype
+        live = [frame.dropna(axis=1, how='all') for frame in live if len(frame)]
+        if not live:
+            return history
+        return pd.concat([history] + live).sort_values('session_date', kind='stable')
+
+    def _histories(self, student_ids):
+        """Every session of the given students, export and ingested, in parts"""
+        frames = [self.index.sessions_for_many(student_ids)]
+        frames += [frame[frame['student_id'].isin(student_ids)] for frame in self._live]
+        return [frame for frame in frames if len(frame)]
+
+    def metrics(self, now=None):
+        """Current student metrics (a copy the caller may keep)"""
+        with self._lock:
+            changes = self._rescore_day(now)
+            metrics = self.store.metrics(now).copy()
+        self._notify(changes)
+        return metrics
+
+    def _rescore_day(self, now):
+        """Re-level everyone on a new day; returns the risk changes"""
+        # days_since_last moves with the date, so a new day can change anyone's
+        # level (e.g. a student turning inactive); rebuild the rollup's risk
+        # buckets from scratch when it does
+        now = pd.Timestamp(now if now is not None else datetime.now())
+        if now.date() == self._day:
+            return []
+        self._day = now.date()
+        metrics = self.store.metrics(now)
+        levels = metrics.set_index('student_id')['risk_level']
+        self.rollup = CohortRollup.from_sessions(self.index.sessions, levels)
+        for frame in self._live:
+            self.rollup.add(frame, levels)
+        old_levels, self._levels = self._levels, levels.to_dict()
+        changed = metrics[metrics['risk_level'].to_numpy() != metrics['student_id'].map(old_levels).to_numpy()]
+        changes = self._record(changed, old_levels, now)
+        if changes:
+            self.version += 1
+        return changes
+
+    def _record(self, updated, old_levels, now):
+        """Risk changes of the updated metric rows whose level moved, kept for display"""
+        changes = [{
+            'student_id': student_id,
+            'old_level': old_levels.get(student_id),
+            'new_level': level,
+            'risk_score': int(score),
+            'changed_at': now.isoformat(),
+        } for student_id, level, score in zip(updated['student_id'], updated['risk_level'], updated['risk_score'])
+            if old_levels.get(student_id) != level]
+        self.recent_changes.extendleft(changes)
+        return changes
+
+    def _notify(self, changes):
+        if changes:
+            for callback in self.subscribers:
+                callback(changes)
+
+    def _complete(self, events, now):
+        """Fill in the name and grade an event leaves out.
+
+        They come from the student's record, or from another event of the
+        batch for a new student. Events of a new student that nothing names
+        or grades are dropped, since every student needs both.
+        """
+        known = self.store.metrics(now).set_index('student_id')
+        by_student = events.groupby('student_id', sort=False)
+        events = events.assign(**{
+            column: events[column]
+            .fillna(events['student_id'].map(known[column]))
+            .fillna(by_student[column].transform('first'))
+            for column in ('student_name', 'grade_level')
+        })
+        incomplete = events['student_name'].isna() | events['grade_level'].isna()
+        if incomplete.any():
+            logger.warning("Dropping %d events of new students without a name or grade level: %s",
+                           incomplete.sum(), ", ".join(pd.unique(events.loc[incomplete, 'student_id'])))
+        return events[~incomplete]
+
+    def ingest(self, events, now=None):
+        """Fold an event batch in; returns the students whose risk level changed
+
+        A new day re-levels everyone first, so its changes are included even
+        when there are no events.
+        """
+        now = pd.Timestamp(now if now is not None else datetime.now())
+        with self._lock:
+            changes = self._rescore_day(now)
+            if events is not None and len(events):
+                changes += self._fold(events, now)
+        self._notify(changes)
+        return changes
+
+    def _fold(self, events, now):
+        events = self._complete(events, now)
+        if not len(events):
+            return []
+        student_ids = pd.unique(events['student_id'])
+        metrics = self.store.append(events[SESSION_COLUMNS], now)
+        updated = metrics[metrics['student_id'].isin(student_ids)]
+        new_levels = dict(zip(updated['student_id'], updated['risk_level']))
+        old_levels = {s: self._levels.get(s) for s in student_ids}
+        moved = [s for s in student_ids if old_levels[s] is not None and old_levels[s] != new_levels[s]]
+
+        # Re-bucket the earlier sessions of students who changed level, then
+        # count the new sessions under everyone's new level
+        for history in self._histories(moved) if moved else []:
+            self.rollup.move(history, old_levels, new_levels)
+        self.rollup.add(events, new_levels)
+
+        self._live.append(events)
+        self._levels.update(new_levels)
+        self.version += 1
+        self.events_ingested += len(events)
+        self.last_ingested_at = now
+        return self._record(updated, old_levels, now)
+
+    def poll(self, now=None):
+        """Ingest whatever the tailer has; returns the risk changes
+
+        Safe to call from several threads (e.g. one per dashboard session):
+        batches are read and folded in one at a time, in file order.
+        """
+        with self._lock:
+            return self.ingest(self.tailer.poll(), now)
+
+
+def run(drop_dir, data_file=DEFAULT_DATA_FILE, changes_file=None, interval=POLL_SECONDS, rules=None):
+    """Tail drop_dir forever, publishing risk changes as JSON lines"""
+    start = time.perf_counter()
+    live = LiveScores(load_sessions(data_file), DropDirectoryTailer(drop_dir), rules=rules)
+    print(f"✅ Scored {len(live):,} students from {data_file} in "
+          f"{time.perf_counter() - start:.1f}s; watching {drop_dir}")
+
+    def publish(changes):
+        lines = "".join(json.dumps(change) + "\n" for change in changes)
+        if changes_file:
+            with open(changes_file, "a") as out:
+                out.write(lines)
+        else:
+            print(lines, end="", flush=True)
+
+    live.subscribe(publish)
+    while True:
+        batch_start, version = time.perf_counter(), live.version
+        changes = live.poll()
+        if live.version != version:
+            logger.info("Batch %d: %d risk changes in %.3fs", live.version, len(changes),
+                        time.perf_counter() - batch_start)
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tail session events and publish risk changes")
+    parser.add_argument("drop_dir", help="directory of .jsonl / .csv session event files")
+    parser.add_argument("--data", default=DEFAULT_DATA_FILE, help="session export to start from")
+    parser.add_argument("--changes", help="append risk changes to this JSONL file (default: stdout)")
+    parser.add_argument("--interval", type=float, default=POLL_SECONDS, help="seconds between polls")
+    parser.add_argument("--rules", default=os.environ.get("RISK_RULES_FILE"),
+                        help="risk rule set JSON file (default: built-in rules)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    try:
+        run(args.drop_dir, args.data, args.changes, args.interval, load_rule_set(args.rules))
+    except KeyboardInterrupt:
+        pass
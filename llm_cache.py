@@ -0,0 +1,138 @@
+"""
+Persistent LLM response cache
+
+Responses are stored in a small SQLite file keyed by a hash of the model,
+the prompt template version, the generation parameters and the prompt itself.
+Since the prompt embeds the student's metrics, any change to those metrics
+produces a new key and the stale entry simply ages out. Entries expire after
+a TTL and the least recently used ones are evicted beyond max_entries.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_FILE = os.path.join(".cache", "llm_responses.sqlite")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 50_000
+
+
+def cache_key(model, prompt, template_version, **params):
+    """Stable hash of everything that determines a response"""
+    payload = json.dumps(
+        {"model": model, "prompt": prompt, "template_version": template_version, "params": params},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Disk-backed TTL + LRU cache of LLM responses, shared across restarts"""
+
+    def __init__(self, path, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+                 clock=time.time):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at)")
+
+    def get(self, key):
+        """Cached response for key, or None when missing or expired"""
+        now = self.clock()
+        with self._lock:
+            row = self._db.execute("SELECT response, created_at FROM responses WHERE key = ?",
+                                   (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def peek(self, key):
+        """Whether key holds a live entry; does not count as a lookup"""
+        with self._lock:
+            row = self._db.execute("SELECT created_at FROM responses WHERE key = ?",
+                                   (key,)).fetchone()
+        return row is not None and self.clock() - row[0] <= self.ttl_seconds
+
+    def set(self, key, response):
+        now = self.clock()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._evict(now)
+
+    def set_many(self, items):
+        """Store (key, response) pairs in one transaction"""
+        now = self.clock()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    ((key, response, now, now) for key, response in items),
+                )
+                self._evict(now)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _evict(self, now):
+        expired = self._db.execute("DELETE FROM responses WHERE created_at < ?",
+                                   (now - self.ttl_seconds,)).rowcount
+        overflow = self._db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        self.evictions += expired + overflow
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current entry count"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self),
+        }
@@ -0,0 +1,165 @@
+"""
+Shared, instrumented Anthropic client
+
+One client per process keeps its HTTP connection pool (and TLS sessions)
+alive between calls. The wrapper caps concurrent requests and records the
+latency and token usage of every call so p50/p95 can be reported.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import anthropic
+
+from perf import percentile
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT_SECONDS = 30.0
+CONNECT_TIMEOUT_SECONDS = 5.0
+# Longest wait for the next chunk of a streamed response. Kept at
+# ai_insights.STALL_TIMEOUT_SECONDS so a stream the reader gave up on fails
+# (and frees its concurrency slot) by the time StreamStalled is raised
+STREAM_READ_TIMEOUT_SECONDS = 5.0
+MAX_CONCURRENT_REQUESTS = 4
+LATENCY_WINDOW = 1000  # most recent calls kept for percentiles
+
+
+class LLMMetrics:
+    """Thread-safe latency and token-usage counters"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.first_token_latencies = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def record(self, seconds, usage=None, error=False):
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.latencies.append(seconds)
+            if usage is not None:
+                self.input_tokens += getattr(usage, "input_tokens", 0) or 0
+                self.output_tokens += getattr(usage, "output_tokens", 0) or 0
+
+    def record_first_token(self, seconds):
+        with self._lock:
+            self.first_token_latencies.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = list(self.latencies)
+            first_token = list(self.first_token_latencies)
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "p50_seconds": percentile(latencies, 0.50) if latencies else None,
+                "p95_seconds": percentile(latencies, 0.95) if latencies else None,
+                "ttft_p50_seconds": percentile(first_token, 0.50) if first_token else None,
+                "ttft_p95_seconds": percentile(first_token, 0.95) if first_token else None,
+            }
+
+
+class _TimedStream:
+    """Passes a MessageStream through, timing its first text chunk"""
+
+    def __init__(self, stream, metrics, clock, start):
+        self._stream = stream
+        self._metrics = metrics
+        self._clock = clock
+        self._start = start
+        self.finished = False
+
+    @property
+    def text_stream(self):
+        first = True
+        for text in self._stream.text_stream:
+            if first:
+                first = False
+                seconds = self._clock() - self._start
+                self._metrics.record_first_token(seconds)
+                logger.info("Claude time to first token: %.2fs", seconds)
+            yield text
+        self.finished = True
+
+    def get_final_message(self):
+        return self._stream.get_final_message()
+
+    def close(self):
+        """Drop the connection; a blocked text_stream read then fails"""
+        self._stream.close()
+
+
+class _InstrumentedMessages:
+    def __init__(self, messages, semaphore, metrics, clock, stream_timeout=None):
+        self._messages = messages
+        self._semaphore = semaphore
+        self._metrics = metrics
+        self._clock = clock
+        self._stream_timeout = stream_timeout
+
+    def create(self, **kwargs):
+        with self._semaphore:
+            start = self._clock()
+            try:
+                message = self._messages.create(**kwargs)
+            except Exception:
+                self._metrics.record(self._clock() - start, error=True)
+                raise
+            self._metrics.record(self._clock() - start, getattr(message, "usage", None))
+            return message
+
+    @contextmanager
+    def stream(self, **kwargs):
+        if self._stream_timeout is not None:
+            kwargs.setdefault("timeout", self._stream_timeout)
+        with self._semaphore:
+            start = self._clock()
+            try:
+                with self._messages.stream(**kwargs) as stream:
+                    timed = _TimedStream(stream, self._metrics, self._clock, start)
+                    yield timed
+                    usage = getattr(stream.get_final_message(), "usage", None) if timed.finished else None
+            except Exception:
+                self._metrics.record(self._clock() - start, error=True)
+                raise
+            self._metrics.record(self._clock() - start, usage)
+
+
+class InstrumentedClient:
+    """Wraps a Messages-API client with a concurrency cap and call metrics.
+
+    Exposes the same `client.messages.create(...)` and
+    `client.messages.stream(...)` surface, so any real or fake client can be
+    wrapped. stream_timeout, if given, is passed as the `timeout` of every
+    streamed request.
+    """
+
+    def __init__(self, client, max_concurrent=MAX_CONCURRENT_REQUESTS, metrics=None,
+                 clock=time.perf_counter, stream_timeout=None):
+        self.client = client
+        self.metrics = metrics or LLMMetrics()
+        self.messages = _InstrumentedMessages(
+            client.messages, threading.BoundedSemaphore(max_concurrent), self.metrics, clock,
+            stream_timeout)
+
+
+def create_client(api_key, max_concurrent=MAX_CONCURRENT_REQUESTS):
+    """Anthropic client with explicit timeouts, wrapped for metrics"""
+    client = anthropic.Anthropic(
+        api_key=api_key,
+        timeout=anthropic.Timeout(REQUEST_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+        max_retries=2,
+    )
+    stream_timeout = anthropic.Timeout(REQUEST_TIMEOUT_SECONDS, read=STREAM_READ_TIMEOUT_SECONDS,
+                                       connect=CONNECT_TIMEOUT_SECONDS)
+    return InstrumentedClient(client, max_concurrent, stream_timeout=stream_timeout)
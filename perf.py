@@ -0,0 +1,180 @@
+"""
+Lightweight timing spans and counters for the dashboard's hot paths
+
+Wrap a block in `span(name)` or a function in `@timed(name)` to record how
+long it took; `count(name)` bumps an event counter. Everything lands in a
+process-wide registry that can be exported in the Prometheus text format,
+and every finished span is also logged as a JSON line on the `perf` logger
+(DEBUG level). `start_run()` additionally collects the spans of the current
+thread, which is how the dashboard shows per-rerun timings.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("perf")
+
+SPAN_WINDOW = 1000  # most recent durations kept per span for percentiles
+
+_current_run = contextvars.ContextVar("perf_run", default=None)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class PerfRegistry:
+    """Thread-safe span durations and event counters"""
+
+    def __init__(self, window=SPAN_WINDOW):
+        self._lock = threading.Lock()
+        self._window = window
+        self.spans = {}  # name -> {"count", "total", "max", "recent"}
+        self.counters = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = {"count": 0, "total": 0.0, "max": 0.0,
+                                            "recent": deque(maxlen=self._window)}
+            stats["count"] += 1
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["recent"].append(seconds)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            spans = {
+                name: {
+                    "count": stats["count"],
+                    "total_seconds": stats["total"],
+                    "max_seconds": stats["max"],
+                    "p50_seconds": percentile(stats["recent"], 0.50),
+                    "p95_seconds": percentile(stats["recent"], 0.95),
+                }
+                for name, stats in self.spans.items()
+            }
+            return {"spans": spans, "counters": dict(self.counters)}
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+
+
+REGISTRY = PerfRegistry()
+
+
+@contextmanager
+def span(name, registry=REGISTRY):
+    """Time the enclosed block, even when it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        registry.record(name, seconds)
+        run = _current_run.get()
+        if run is not None:
+            run.append((name, seconds))
+        logger.debug(json.dumps({"event": "span", "span": name, "seconds": round(seconds, 6)}))
+
+
+def timed(name=None, registry=REGISTRY):
+    """Decorator form of span(), named after the function by default"""
+    def decorate(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, registry):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1, registry=REGISTRY):
+    registry.count(name, value)
+
+
+def start_run():
+    """Start collecting this thread's spans; returns the (name, seconds) list"""
+    run = []
+    _current_run.set(run)
+    return run
+
+
+def _sample(name, value, **labels):
+    label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+    return f"{name}{{{label_text}}} {value:g}" if labels else f"{name} {value:g}"
+
+
+def prometheus_text(registry=REGISTRY, llm_metrics=None, cache_stats=None):
+    """Prometheus exposition-format text for the spans, counters and LLM stats.
+
+    llm_metrics is an LLMMetrics.snapshot() and cache_stats a
+    ResponseCache.stats(); either may be omitted.
+    """
+    snapshot = registry.snapshot()
+    lines = [
+        "# HELP dashboard_span_seconds Time spent in instrumented dashboard code paths",
+        "# TYPE dashboard_span_seconds summary",
+    ]
+    for name, stats in sorted(snapshot["spans"].items()):
+        lines.append(_sample("dashboard_span_seconds", stats["p50_seconds"], span=name, quantile="0.5"))
+        lines.append(_sample("dashboard_span_seconds", stats["p95_seconds"], span=name, quantile="0.95"))
+        lines.append(_sample("dashboard_span_seconds_sum", stats["total_seconds"], span=name))
+        lines.append(_sample("dashboard_span_seconds_count", stats["count"], span=name))
+
+    lines += ["# HELP dashboard_events_total Instrumented events",
+              "# TYPE dashboard_events_total counter"]
+    for name, value in sorted(snapshot["counters"].items()):
+        lines.append(_sample("dashboard_events_total", value, event=name))
+
+    if llm_metrics is not None:
+        lines += [
+            "# TYPE dashboard_llm_calls_total counter",
+            _sample("dashboard_llm_calls_total", llm_metrics["calls"]),
+            "# TYPE dashboard_llm_errors_total counter",
+            _sample("dashboard_llm_errors_total", llm_metrics["errors"]),
+            "# TYPE dashboard_llm_tokens_total counter",
+            _sample("dashboard_llm_tokens_total", llm_metrics["input_tokens"], direction="input"),
+            _sample("dashboard_llm_tokens_total", llm_metrics["output_tokens"], direction="output"),
+        ]
+        for metric, prefix in [("dashboard_llm_latency_seconds", ""),
+                               ("dashboard_llm_first_token_seconds", "ttft_")]:
+            quantiles = [(q, llm_metrics[f"{prefix}{key}_seconds"]) for q, key in [("0.5", "p50"), ("0.95", "p95")]]
+            if quantiles[0][1] is not None:
+                lines.append(f"# TYPE {metric} summary")
+                lines += [_sample(metric, value, quantile=q) for q, value in quantiles]
+
+    if cache_stats is not None:
+        lines += [
+            "# TYPE dashboard_llm_cache_hits_total counter",
+            _sample("dashboard_llm_cache_hits_total", cache_stats["hits"]),
+            "# TYPE dashboard_llm_cache_misses_total counter",
+            _sample("dashboard_llm_cache_misses_total", cache_stats["misses"]),
+            "# TYPE dashboard_llm_cache_evictions_total counter",
+            _sample("dashboard_llm_cache_evictions_total", cache_stats["evictions"]),
+            "# TYPE dashboard_llm_cache_entries gauge",
+            _sample("dashboard_llm_cache_entries", cache_stats["entries"]),
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def log_snapshot(registry=REGISTRY, level=logging.INFO):
+    """Emit the whole registry as one structured (JSON) log line"""
+    logger.log(level, json.dumps({"event": "perf_snapshot", **registry.snapshot()}))
@@ -0,0 +1,194 @@
+# pregenerate_insights.py
+"""
+Nightly pre-generation of AI explanations and recommendations
+
+Scores every student, then asks Claude for the explanation and the
+recommendations of each High and Medium risk student ahead of time. Requests
+run concurrently under a concurrency cap, are retried with exponential
+backoff and pause together when the API reports a rate limit. Responses land
+in the dashboard's response cache under the same keys the dashboard uses, so
+opening a student's expander is served without an API call.
+
+    python pregenerate_insights.py --concurrency 8
+
+With --bulk, students with the same metric profile share one generation and
+the work goes through the Message Batches API instead (see bulk_insights);
+--fake runs that path against a local fake backend and, unless --cache names
+another file, writes its canned responses to a scratch cache in the temp
+directory, never to the dashboard's cache:
+
+    python pregenerate_insights.py --bulk --levels High
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import anthropic
+
+import ai_insights
+import bulk_insights
+from llm_cache import DEFAULT_CACHE_FILE, ResponseCache
+from risk_engine import calculate_risk_metrics, decode_risk_factors
+from risk_rules import load_rule_set
+from session_index import SessionIndex
+from session_io import DEFAULT_DATA_FILE, load_sessions
+
+# Where --fake writes its canned responses by default
+FAKE_CACHE_FILE = os.path.join(tempfile.gettempdir(), "fake_llm_responses.sqlite")
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def _is_retryable(error):
+    if isinstance(error, (anthropic.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS
+
+
+def _retry_after(error):
+    """Seconds the API asked us to wait, if it said so"""
+    response = getattr(error, "response", None)
+    value = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimitGate:
+    """Shared pause so every worker backs off once the API rate-limits one"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.resume_at = 0.0
+
+    def pause(self, seconds):
+        self.resume_at = max(self.resume_at, self.clock() + seconds)
+
+    async def wait(self):
+        delay = self.resume_at - self.clock()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def _complete_with_retry(client, prompt, max_tokens, cache, gate, max_retries, base_delay):
+    for attempt in range(max_retries + 1):
+        await gate.wait()
+        try:
+            return await ai_insights.acomplete(client, prompt, max_tokens, cache)
+        except Exception as error:
+            if attempt == max_retries or not _is_retryable(error):
+                raise
+            delay = base_delay * 2 ** attempt * (1 + random.random())
+            if getattr(error, "status_code", None) == 429:
+                gate.pause(_retry_after(error) or delay)
+            else:
+                await asyncio.sleep(delay)
+
+
+def build_jobs(student_metrics, sessions, risk_levels=("High", "Medium")):
+    """Explanation and recommendation prompts for every student in risk_levels.
+
+    Session slices come from the same SessionIndex as the dashboard's, so
+    prompts (and cache keys) are identical to the ones it builds.
+    """
+    at_risk = student_metrics[student_metrics['risk_level'].isin(risk_levels)]
+    index = SessionIndex(sessions)
+
+    jobs = []
+    for _, row in at_risk.iterrows():
+        jobs.append((row['student_id'], "explanation",
+                     ai_insights.explanation_prompt(row, index.sessions_for(row['student_id'])),
+                     ai_insights.EXPLANATION_MAX_TOKENS))
+        jobs.append((row['student_id'], "recommendations",
+                     ai_insights.recommendations_prompt(row),
+                     ai_insights.RECOMMENDATIONS_MAX_TOKENS))
+    return jobs
+
+
+async def pregenerate(client, jobs, cache, concurrency=8, max_retries=5, base_delay=1.0):
+    """Run prompt jobs concurrently and store their responses in cache.
+
+    Returns counts of generated, already cached and failed jobs.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    gate = RateLimitGate()
+    summary = {"generated": 0, "cached": 0, "failed": 0}
+
+    async def run(student_id, kind, prompt, max_tokens):
+        if ai_insights.is_cached(cache, prompt, max_tokens):
+            summary["cached"] += 1
+            return
+        async with semaphore:
+            try:
+                await _complete_with_retry(client, prompt, max_tokens, cache, gate,
+                                           max_retries, base_delay)
+                summary["generated"] += 1
+            except Exception as error:
+                summary["failed"] += 1
+                print(f"⚠️ {kind} for {student_id} failed: {error}")
+
+    await asyncio.gather(*(run(*job) for job in jobs))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate AI insights for at-risk students")
+    parser.add_argument("--data", default=DEFAULT_DATA_FILE, help="session export to score")
+    parser.add_argument("--cache", help=f"response cache file (default: {DEFAULT_CACHE_FILE}, "
+                                        f"or {FAKE_CACHE_FILE} with --fake)")
+    parser.add_argument("--levels", nargs="+", default=["High", "Medium"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--rules", default=os.environ.get("RISK_RULES_FILE"),
+                        help="risk rule set JSON file, as used by the dashboard (default: built-in rules)")
+    parser.add_argument("--bulk", action="store_true",
+                        help="deduplicate by metric profile and submit through the Message Batches API")
+    parser.add_argument("--fake", action="store_true", help="with --bulk, use a local fake batch backend")
+    parser.add_argument("--poll-seconds", type=float, default=bulk_insights.POLL_SECONDS,
+                        help="with --bulk, how often to check on a submitted batch")
+    args = parser.parse_args()
+    if args.fake:
+        if not args.bulk:
+            parser.error("--fake requires --bulk")
+        args.cache = args.cache or FAKE_CACHE_FILE
+        if os.path.abspath(args.cache) == os.path.abspath(DEFAULT_CACHE_FILE):
+            parser.error("--fake must not write canned responses to the dashboard's cache")
+    args.cache = args.cache or DEFAULT_CACHE_FILE
+
+    api_key = os.environ.get("ANTHROPIC_API_KEY")
+    if not api_key and not args.fake:
+        raise SystemExit("ANTHROPIC_API_KEY is not set")
+
+    sessions = load_sessions(args.data)
+    rules = load_rule_set(args.rules)
+    # Prompts list the risk factors by label
+    student_metrics = decode_risk_factors(calculate_risk_metrics(sessions, rules=rules), rules)
+
+    if args.bulk:
+        cohort = student_metrics[student_metrics['risk_level'].isin(args.levels)]
+        client = bulk_insights.FakeBatchClient() if args.fake else anthropic.Anthropic(api_key=api_key)
+        start = time.perf_counter()
+        summary = bulk_insights.bulk_generate(client, cohort, SessionIndex(sessions), ResponseCache(args.cache),
+                                              poll_seconds=0 if args.fake else args.poll_seconds)
+        tokens = summary['input_tokens'] + summary['output_tokens']
+        print(f"✅ {summary['students']:,} students → {summary['student_prompts']:,} prompts → "
+              f"{summary['profile_prompts']:,} distinct profile prompts")
+        print(f"   {summary['generated']:,} generated, {summary['cached']:,} already cached, "
+              f"{summary['failed']:,} failed in {time.perf_counter() - start:.1f}s · "
+              f"{tokens:,} tokens ({tokens / max(summary['generated'], 1):.1f} per student prompt)")
+        raise SystemExit(0)
+
+    jobs = build_jobs(student_metrics, sessions, args.levels)
+    # Retries are handled here so rate limits pause all workers together
+    client = anthropic.AsyncAnthropic(api_key=api_key, max_retries=0)
+
+    start = time.perf_counter()
+    summary = asyncio.run(pregenerate(client, jobs, ResponseCache(args.cache),
+                                      args.concurrency, args.max_retries))
+    print(f"✅ {summary['generated']} generated, {summary['cached']} already cached, "
+          f"{summary['failed']} failed in {time.perf_counter() - start:.1f}s")
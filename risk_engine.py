@@ -0,0 +1,541 @@
+"""
+Risk scoring engine for the Student Risk Dashboard
+
+Sessions are folded into mergeable per-student aggregates (running sums and
+counts, the first and last engagement windows, first/last session) which are
+then scored in one vectorized pass. The same aggregates back the incremental
+RiskMetricStore, so appending new sessions only touches the students they
+belong to.
+"""
+
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from risk_rules import DEFAULT_RULE_SET
+
+# Bump whenever the metric calculations change so cached results are not
+# reused; rule thresholds and weights are keyed by RuleSet.fingerprint
+SCORING_VERSION = 3
+
+# Number of sessions compared at each end of a student's history for the trend
+TREND_WINDOW = 8
+
+# Sessions a RiskMetricStore batch needs before it is worth starting a process
+# pool (~1.5 s); smaller appends such as live micro-batches are folded serially
+PARALLEL_MIN_ROWS = 500_000
+
+# Risk factor labels of the default rules, in the order they are reported
+RISK_FACTOR_LABELS = DEFAULT_RULE_SET.factor_labels
+
+METRIC_COLUMNS = [
+    'student_id', 'student_name', 'grade_level', 'risk_level', 'risk_score',
+    'avg_engagement', 'engagement_trend', 'completion_rate', 'homework_rate',
+    'attendance_rate', 'total_sessions', 'days_since_last', 'risk_factor_mask',
+    'last_session'
+]
+
+# Metric columns as written to files and shown: the factor bitmask decoded
+OUTPUT_COLUMNS = [
+    'risk_factors' if column == 'risk_factor_mask' else column for column in METRIC_COLUMNS
+]
+
+# Session columns the engine reads
+SESSION_COLUMNS = [
+    'student_id', 'student_name', 'grade_level', 'session_date',
+    'engagement_score', 'completed', 'homework_completed'
+]
+
+_SUM_COLUMNS = [
+    'total_sessions', 'engagement_sum', 'engagement_count', 'completed_sum',
+    'completed_count', 'homework_sum', 'homework_count'
+]
+_FIRST_COLUMNS = ['first_session', 'first_seq', 'student_name', 'grade_level']
+
+
+def _empty_window(n):
+    """Date, sequence and engagement arrays for n students with no sessions"""
+    return (np.zeros((n, TREND_WINDOW), dtype=np.int64),
+            np.full((n, TREND_WINDOW), -1, dtype=np.int64),
+            np.full((n, TREND_WINDOW), np.nan))
+
+
+def _build_windows(codes, dates, seqs, values, n_students):
+    """Keep the first and last TREND_WINDOW sessions of each student.
+
+    Rows must already be sorted by (codes, dates, seqs).
+    """
+    counts = np.bincount(codes, minlength=n_students)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    position = np.arange(len(codes)) - starts[codes]
+    position_from_end = counts[codes] - 1 - position
+
+    windows = []
+    for slot in (position, position_from_end):
+        keep = slot < TREND_WINDOW
+        window = _empty_window(n_students)
+        for target, source in zip(window, (dates, seqs, values)):
+            target[codes[keep], slot[keep]] = source[keep]
+        windows.append(window)
+    return windows
+
+
+def _aggregate_arrays(codes, n_students, seqs, dates, engagement, completed, homework):
+    """Numeric core of StudentAggregates.from_sessions.
+
+    Returns the totals columns, the row of each student's first session and
+    the early/recent windows, all indexed by student code.
+    """
+    # Every session is ordered by (student, date, arrival)
+    order = np.lexsort((seqs, dates, codes))
+    codes, seqs, dates = codes[order], seqs[order], dates[order]
+    engagement, completed, homework = engagement[order], completed[order], homework[order]
+
+    total_sessions = np.bincount(codes, minlength=n_students)
+    starts = np.concatenate(([0], np.cumsum(total_sessions)[:-1]))
+    ends = starts + total_sessions - 1
+
+    def _sum(values):
+        present = ~np.isnan(values)
+        return (np.bincount(codes, weights=np.where(present, values, 0.0), minlength=n_students),
+                np.bincount(codes, weights=present, minlength=n_students).astype(np.int64))
+
+    engagement_sum, engagement_count = _sum(engagement)
+    completed_sum, completed_count = _sum(completed)
+    homework_sum, homework_count = _sum(homework)
+
+    columns = {
+        'total_sessions': total_sessions.astype(np.int64),
+        'engagement_sum': engagement_sum,
+        'engagement_count': engagement_count,
+        'completed_sum': completed_sum,
+        'completed_count': completed_count,
+        'homework_sum': homework_sum,
+        'homework_count': homework_count,
+        'first_session': dates[starts].view('datetime64[ns]'),
+        'first_seq': seqs[starts],
+        'last_session': dates[ends].view('datetime64[ns]'),
+    }
+    early, recent = _build_windows(codes, dates, seqs, engagement, n_students)
+    return columns, order[starts], early, recent
+
+
+def _aggregate_parallel(codes, student_ids, arrays, workers):
+    """Run _aggregate_arrays over hash partitions of students in a process pool.
+
+    A stable hash of student_id assigns each student to a shard, so shards
+    hold disjoint students and the reassembled result is identical to the
+    serial one. Only numeric arrays cross the process boundary.
+    """
+    n_students = len(student_ids)
+    student_shard = pd.util.hash_array(student_ids.to_numpy(dtype=object)) % workers
+    row_shard = student_shard[codes]
+
+    tasks, layout = [], []
+    for shard in range(workers):
+        students = np.flatnonzero(student_shard == shard)
+        if not len(students):
+            continue
+        rows = np.flatnonzero(row_shard == shard)
+        local_code = np.empty(n_students, dtype=np.int64)
+        local_code[students] = np.arange(len(students))
+        tasks.append((local_code[codes[rows]], len(students)) + tuple(a[rows] for a in arrays))
+        layout.append((students, rows))
+
+    with ProcessPoolExecutor(max_workers=len(tasks), mp_context=_worker_context()) as pool:
+        parts = list(pool.map(_aggregate_shard, tasks))
+
+    columns = {name: np.empty(n_students, dtype=values.dtype) for name, values in parts[0][0].items()}
+    first_rows = np.empty(n_students, dtype=np.int64)
+    early, recent = _empty_window(n_students), _empty_window(n_students)
+    for (students, rows), (part_columns, part_first, part_early, part_recent) in zip(layout, parts):
+        for name, values in part_columns.items():
+            columns[name][students] = values
+        first_rows[students] = rows[part_first]
+        for target, source in zip(early + recent, part_early + part_recent):
+            target[students] = source
+    return columns, first_rows, early, recent
+
+
+def _worker_context():
+    """Start workers without fork: the caller may be a multithreaded server
+    (Streamlit), where forking can deadlock on locks held by other threads"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _aggregate_shard(task):
+    """Process pool entry point for one hash partition of students"""
+    columns, first_rows, early, recent = _aggregate_arrays(*task)
+    return columns, first_rows, tuple(early), tuple(recent)
+
+
+def _window_mean(window):
+    """Mean engagement of each student's window, ignoring empty slots"""
+    _, seqs, values = window
+    present = (seqs >= 0) & ~np.isnan(values)
+    total = np.where(present, values, 0.0).sum(axis=1)
+    count = present.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / count
+
+
+class StudentAggregates:
+    """Mergeable per-student partial aggregates of a session table.
+
+    `totals` is indexed by student_id in order of first appearance; the
+    early/recent windows are aligned row-for-row with it. Every session gets a
+    sequence number so same-day sessions keep their arrival order.
+    """
+
+    def __init__(self, totals, early, recent, next_seq):
+        self.totals = totals
+        self.early = early
+        self.recent = recent
+        self.next_seq = next_seq
+
+    @classmethod
+    def empty(cls):
+        totals = pd.DataFrame({
+            'total_sessions': pd.Series(dtype=np.int64),
+            'engagement_sum': pd.Series(dtype=float),
+            'engagement_count': pd.Series(dtype=np.int64),
+            'completed_sum': pd.Series(dtype=float),
+            'completed_count': pd.Series(dtype=np.int64),
+            'homework_sum': pd.Series(dtype=float),
+            'homework_count': pd.Series(dtype=np.int64),
+            'first_session': pd.Series(dtype='datetime64[ns]'),
+            'first_seq': pd.Series(dtype=np.int64),
+            'last_session': pd.Series(dtype='datetime64[ns]'),
+            'student_name': pd.Series(dtype=object),
+            'grade_level': pd.Series(dtype=np.int64),
+        }, index=pd.Index([], name='student_id', dtype=object))
+        return cls(totals, _empty_window(0), _empty_window(0), 0)
+
+    @classmethod
+    def from_sessions(cls, df, first_seq=0, workers=1):
+        """Aggregate a session frame in a single sort-and-groupby pass.
+
+        With workers > 1 students are hash-partitioned across a process pool
+        and each shard is aggregated independently; the result is identical
+        to the serial one.
+        """
+        if df.empty:
+            aggregates = cls.empty()
+            aggregates.next_seq = first_seq
+            return aggregates
+
+        # Students are numbered in order of first appearance; the numeric
+        # work runs on plain arrays so it can be shipped to worker processes
+        codes, student_ids = pd.factorize(df['student_id'])
+        arrays = (
+            np.arange(first_seq, first_seq + len(df), dtype=np.int64),
+            pd.to_datetime(df['session_date']).to_numpy('datetime64[ns]').view(np.int64),
+            df['engagement_score'].to_numpy(dtype=float),
+            df['completed'].to_numpy(dtype=float),
+            df['homework_completed'].to_numpy(dtype=float),
+        )
+        if workers > 1 and len(student_ids) > 1:
+            columns, first_rows, early, recent = _aggregate_parallel(
+                codes, student_ids, arrays, workers)
+        else:
+            columns, first_rows, early, recent = _aggregate_arrays(codes, len(student_ids), *arrays)
+
+        columns['student_name'] = df['student_name'].to_numpy(dtype=object)[first_rows]
+        columns['grade_level'] = df['grade_level'].to_numpy()[first_rows]
+        totals = pd.DataFrame(columns, index=pd.Index(student_ids.to_numpy(dtype=object), name='student_id'))
+        return cls(totals, early, recent, first_seq + len(df))
+
+    def merge(self, other):
+        """Fold another set of aggregates into this one, in place.
+
+        Only the students present in `other` are touched. Returns their
+        positions in `totals`.
+        """
+        if other.totals.empty:
+            self.next_seq = max(self.next_seq, other.next_seq)
+            return np.array([], dtype=np.int64)
+
+        if self.totals.empty:
+            self.totals, self.early, self.recent = other.totals.copy(), other.early, other.recent
+            self.next_seq = max(self.next_seq, other.next_seq)
+            return np.arange(len(self.totals))
+
+        positions = self.totals.index.get_indexer(other.totals.index)
+        is_new = positions < 0
+
+        # Brand new students are appended as-is
+        if is_new.any():
+            n_existing = len(self.totals)
+            self.totals = pd.concat([self.totals, other.totals[is_new]])
+            self.early = tuple(np.concatenate([a, b[is_new]]) for a, b in zip(self.early, other.early))
+            self.recent = tuple(np.concatenate([a, b[is_new]]) for a, b in zip(self.recent, other.recent))
+            positions[is_new] = np.arange(n_existing, len(self.totals))
+
+        existing = ~is_new
+        if existing.any():
+            self._merge_existing(positions[existing], other, np.flatnonzero(existing))
+
+        self.next_seq = max(self.next_seq, other.next_seq)
+        return positions
+
+    def _merge_existing(self, positions, other, other_positions):
+        mine = self.totals.iloc[positions]
+        theirs = other.totals.iloc[other_positions]
+
+        last_session = np.maximum(mine['last_session'].to_numpy(), theirs['last_session'].to_numpy())
+        their_first = (
+            (theirs['first_session'].to_numpy() < mine['first_session'].to_numpy())
+            | ((theirs['first_session'].to_numpy() == mine['first_session'].to_numpy())
+               & (theirs['first_seq'].to_numpy() < mine['first_seq'].to_numpy()))
+        )
+
+        for column in _SUM_COLUMNS:
+            self.totals.iloc[positions, self.totals.columns.get_loc(column)] = \
+                mine[column].to_numpy() + theirs[column].to_numpy()
+        self.totals.iloc[positions, self.totals.columns.get_loc('last_session')] = last_session
+        if their_first.any():
+            for column in _FIRST_COLUMNS:
+                self.totals.iloc[positions[their_first], self.totals.columns.get_loc(column)] = \
+                    theirs[column].to_numpy()[their_first]
+
+        # Re-select the windows from the union of both sides' windows, which
+        # always contains the combined first and last TREND_WINDOW sessions
+        n = len(positions)
+        local = np.arange(n)
+        parts = [
+            tuple(a[positions] for a in self.early), tuple(a[positions] for a in self.recent),
+            tuple(a[other_positions] for a in other.early), tuple(a[other_positions] for a in other.recent),
+        ]
+        dates = np.concatenate([p[0] for p in parts], axis=1).ravel()
+        seqs = np.concatenate([p[1] for p in parts], axis=1).ravel()
+        values = np.concatenate([p[2] for p in parts], axis=1).ravel()
+        codes = np.repeat(local, 4 * TREND_WINDOW)
+
+        keep = seqs >= 0
+        codes, dates, seqs, values = codes[keep], dates[keep], seqs[keep], values[keep]
+        _, unique = np.unique(seqs, return_index=True)
+        codes, dates, seqs, values = codes[unique], dates[unique], seqs[unique], values[unique]
+        order = np.lexsort((seqs, dates, codes))
+        early, recent = _build_windows(codes[order], dates[order], seqs[order], values[order], n)
+
+        for target, source in zip(self.early, early):
+            target[positions] = source
+        for target, source in zip(self.recent, recent):
+            target[positions] = source
+
+
+def score_aggregates(aggregates, positions=None, now=None, rules=None):
+    """Score students from their aggregates with a rule set (default rules if None).
+
+    Scores every student, or only those at `positions` in aggregates.totals.
+    """
+    rules = rules or DEFAULT_RULE_SET
+    totals = aggregates.totals
+    early, recent = aggregates.early, aggregates.recent
+    if positions is not None:
+        totals = totals.iloc[positions]
+        early = tuple(a[positions] for a in early)
+        recent = tuple(a[positions] for a in recent)
+    if totals.empty:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_engagement = totals['engagement_sum'].to_numpy() / totals['engagement_count'].to_numpy()
+        completion_rate = totals['completed_sum'].to_numpy() / totals['completed_count'].to_numpy()
+        homework_rate = totals['homework_sum'].to_numpy() / totals['homework_count'].to_numpy()
+
+    # Calculate engagement trend (last 4 weeks vs first 4 weeks)
+    engagement_trend = _window_mean(recent) - _window_mean(early)
+
+    # Calculate attendance consistency
+    total_sessions = totals['total_sessions'].to_numpy()
+    attendance_rate = total_sessions / rules.expected_sessions
+
+    # Days since last session
+    now = pd.Timestamp(now if now is not None else datetime.now())
+    days_since_last = (now - totals['last_session']).dt.days.to_numpy()
+
+    # Risk score, factors and level from the compiled rules. Factors stay a
+    # bitmask (one byte per student with the default rules) and are decoded
+    # to labels only for display and output, see decode_risk_factors
+    risk_score, factor_mask, risk_level = rules.evaluate({
+        'avg_engagement': avg_engagement,
+        'engagement_trend': engagement_trend,
+        'completion_rate': completion_rate,
+        'homework_rate': homework_rate,
+        'attendance_rate': attendance_rate,
+        'total_sessions': total_sessions,
+        'days_since_last': days_since_last,
+    })
+
+    return pd.DataFrame({
+        'student_id': totals.index.to_numpy(dtype=object),
+        'student_name': totals['student_name'].to_numpy(),
+        'grade_level': pd.to_numeric(totals['grade_level'], downcast='integer').to_numpy(),
+        'risk_level': risk_level,
+        'risk_score': risk_score.astype(np.int16),
+        'avg_engagement': avg_engagement,
+        'engagement_trend': engagement_trend,
+        'completion_rate': completion_rate,
+        'homework_rate': homework_rate,
+        'attendance_rate': attendance_rate,
+        'total_sessions': total_sessions.astype(np.int32),
+        'days_since_last': days_since_last.astype(np.int32),
+        'risk_factor_mask': factor_mask.astype(rules.mask_dtype),
+        'last_session': totals['last_session'].to_numpy()
+    }, columns=METRIC_COLUMNS)
+
+
+def calculate_risk_metrics(df, now=None, workers=1, rules=None):
+    """Calculate risk indicators for each student in one sort-and-groupby pass.
+
+    workers > 1 aggregates hash partitions of students in a process pool.
+    """
+    return score_aggregates(StudentAggregates.from_sessions(df, workers=workers), now=now, rules=rules)
+
+
+def decode_risk_factors(metrics, rules=None):
+    """Replace the risk factor bitmask with a `risk_factors` label list.
+
+    Takes the metrics frame or one student's row; rules must be the rule set
+    the metrics were scored with (default rules if None).
+    """
+    rules = rules or DEFAULT_RULE_SET
+    if isinstance(metrics, pd.Series):
+        row = metrics.drop('risk_factor_mask').to_dict()
+        row['risk_factors'] = rules.factors(metrics['risk_factor_mask'])
+        return pd.Series(row, name=metrics.name)[OUTPUT_COLUMNS]
+    masks = metrics['risk_factor_mask'].to_numpy()
+    distinct, inverse = np.unique(masks, return_inverse=True)
+    labels = [rules.factors(mask) for mask in distinct]
+    decoded = metrics.drop(columns='risk_factor_mask')
+    decoded['risk_factors'] = [list(labels[i]) for i in inverse.reshape(-1)]
+    return decoded[['risk_factors' if column == 'risk_factor_mask' else column
+                    for column in metrics.columns]]
+
+
+def compare_rule_sets(aggregates, rule_sets, now=None):
+    """Score one population under several rule sets.
+
+    The aggregates are computed once and each rule set is a vectorized pass
+    over them. Returns the metrics of every rule set stacked, with the rule
+    set's name in a leading `rule_set` column and the risk factors decoded
+    (each set has its own factor bits).
+    """
+    return pd.concat(
+        [decode_risk_factors(score_aggregates(aggregates, now=now, rules=rules), rules)
+         .assign(rule_set=rules.name) for rules in rule_sets],
+        ignore_index=True,
+    )[['rule_set'] + OUTPUT_COLUMNS]
+
+
+def aggregate_session_batches(batches):
+    """Fold an iterable of session frames into one set of aggregates.
+
+    Only one batch and the per-student aggregates are resident at a time.
+    """
+    aggregates = StudentAggregates.empty()
+    for batch in batches:
+        aggregates.merge(StudentAggregates.from_sessions(batch, first_seq=aggregates.next_seq))
+    return aggregates
+
+
+def score_session_batches(batches, now=None, rules=None):
+    """Streaming equivalent of calculate_risk_metrics for out-of-core data"""
+    return score_aggregates(aggregate_session_batches(batches), now=now, rules=rules)
+
+
+def _digest(row_hashes):
+    """Digest of a session frame's row hashes"""
+    return hashlib.sha256(row_hashes.tobytes()).digest()
+
+
+class RiskMetricStore:
+    """Persistent per-student aggregates with incrementally maintained scores.
+
+    New sessions are folded into the aggregates and only the students they
+    belong to are re-scored. Everyone is re-scored from the aggregates (not
+    the session history) when the calendar day changes, since
+    days_since_last depends on it. The returned metrics frame is owned by the
+    store and must not be mutated by callers. With workers > 1 only batches of
+    at least PARALLEL_MIN_ROWS sessions (a full load) use the process pool.
+    """
+
+    def __init__(self, workers=1, rules=None):
+        self.workers = workers
+        self.rules = rules or DEFAULT_RULE_SET
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.aggregates = StudentAggregates.empty()
+        self._metrics = pd.DataFrame(columns=METRIC_COLUMNS)
+        self._scored_on = None
+        self._source = None
+        self._source_rows = 0
+        self._source_digest = _digest(np.empty(0, dtype=np.uint64))
+
+    def append(self, sessions, now=None):
+        """Fold new session rows into the store and re-score their students"""
+        with self._lock:
+            return self._append(sessions, now)
+
+    def _append(self, sessions, now):
+        now = pd.Timestamp(now if now is not None else datetime.now())
+        workers = self.workers if len(sessions) >= PARALLEL_MIN_ROWS else 1
+        update = StudentAggregates.from_sessions(sessions, first_seq=self.aggregates.next_seq,
+                                                 workers=workers)
+        n_before = len(self.aggregates.totals)
+        positions = self.aggregates.merge(update)
+        if self._scored_on != now.date():
+            return self._current(now)
+        if len(positions):
+            rescored = score_aggregates(self.aggregates, positions, now, self.rules)
+            existing = positions < n_before
+            if existing.any():
+                for column in METRIC_COLUMNS:
+                    self._metrics.iloc[positions[existing], self._metrics.columns.get_loc(column)] = \
+                        rescored[column].to_numpy()[existing]
+            if (~existing).any():
+                self._metrics = pd.concat([self._metrics, rescored[~existing]], ignore_index=True)
+        return self._metrics
+
+    def sync(self, df, now=None):
+        """Bring the store up to date with a session frame.
+
+        The frame is treated as an append-only log: rows beyond those already
+        folded in are appended, while a frame that is shorter or whose first
+        rows differ in any way from those seen so far (compared by a content
+        hash of the engine's columns) triggers a rebuild.
+        """
+        with self._lock:
+            return self._sync(df, now)
+
+    def _sync(self, df, now):
+        if df is self._source and len(df) == self._source_rows:
+            return self._current(now)
+        row_hashes = pd.util.hash_pandas_object(df[SESSION_COLUMNS], index=False).to_numpy()
+        seen = self._source_rows
+        if len(df) < seen or _digest(row_hashes[:seen]) != self._source_digest:
+            self._reset()
+        new_rows = df.iloc[self._source_rows:]
+        self._source, self._source_rows, self._source_digest = df, len(df), _digest(row_hashes)
+        return self._append(new_rows, now)
+
+    def metrics(self, now=None):
+        """Current student metrics, re-scored from aggregates on a new day"""
+        with self._lock:
+            return self._current(now)
+
+    def _current(self, now):
+        now = pd.Timestamp(now if now is not None else datetime.now())
+        if self._scored_on != now.date():
+            self._metrics = score_aggregates(self.aggregates, now=now, rules=self.rules)
+            self._scored_on = now.date()
+        return self._metrics
@@ -0,0 +1,194 @@
+"""
+Declarative risk rules
+
+Every threshold and weight used to score students lives in one rule set: each
+rule tests one metric against a list of tiers (the first matching tier's
+points are added to the risk score) and carries the risk factor label,
+explanation sentence and recommended intervention reported when its first
+tier matches. Risk levels are minimum scores.
+
+A rule set is compiled once into vectorized NumPy expressions that score a
+whole population in one pass, and the same compiled rules produce the
+rule-based explanations and recommendations. Alternative rule sets are JSON
+files of the same shape; print the default one as a starting point with:
+
+    python risk_rules.py > my_rules.json
+"""
+
+import hashlib
+import json
+import operator
+import sys
+
+import numpy as np
+
+DEFAULT_RULES = {
+    "name": "default",
+    # Sessions a student is expected to have attended (12 weeks * 2 a week)
+    "expected_sessions": 24,
+    # Highest level first; students below every minimum get default_level
+    "levels": [
+        {"level": "High", "min_score": 7},
+        {"level": "Medium", "min_score": 4},
+    ],
+    "default_level": "Low",
+    # Factors and explanations are reported in this order
+    "rules": [
+        {
+            "metric": "avg_engagement", "op": "<",
+            "tiers": [{"value": 5, "points": 3}, {"value": 7, "points": 1}],
+            "factor": "Low engagement",
+            "explanation": "Low average engagement score of {value:.1f}/10 indicates the student is not actively participating.",
+            "recommendation": "🎯 **Tutor Match Review**: Consider matching with a different tutor who specializes in engagement strategies.",
+            "priority": 2,
+        },
+        {
+            "metric": "engagement_trend", "op": "<",
+            "tiers": [{"value": -2, "points": 3}, {"value": -1, "points": 2}],
+            "factor": "Declining engagement",
+            "explanation": "Engagement has declined significantly by {magnitude:.1f} points over the past weeks.",
+            "recommendation": "🔍 **Root Cause Analysis**: Schedule a meeting with tutor, student, and parent to identify underlying issues causing declining engagement.",
+            "priority": 4,
+        },
+        {
+            "metric": "completion_rate", "op": "<",
+            "tiers": [{"value": 0.7, "points": 2}],
+            "factor": "Low session completion",
+            "explanation": "Only {value:.0%} of sessions are being completed.",
+            "recommendation": "⏰ **Session Structure Review**: Adjust session length or format to improve completion rates.",
+            "priority": 6,
+        },
+        {
+            "metric": "homework_rate", "op": "<",
+            "tiers": [{"value": 0.5, "points": 2}],
+            "factor": "Low homework completion",
+            "explanation": "Homework completion rate is low at {value:.0%}.",
+            "recommendation": "📚 **Homework Support Plan**: Implement a structured homework completion system with shorter, more manageable assignments.",
+            "priority": 3,
+        },
+        {
+            "metric": "attendance_rate", "op": "<",
+            "tiers": [{"value": 0.6, "points": 2}],
+            "factor": "Poor attendance",
+            "explanation": "Attendance is inconsistent at {value:.0%} of expected sessions.",
+            "recommendation": "📅 **Schedule Optimization**: Work with family to find more convenient session times and reduce scheduling conflicts.",
+            "priority": 5,
+        },
+        {
+            "metric": "days_since_last", "op": ">",
+            "tiers": [{"value": 14, "points": 2}],
+            "factor": "Inactive student",
+            "explanation": "Student has been inactive for {value} days.",
+            "recommendation": "📞 **Immediate Outreach**: Contact student/parent to re-engage and understand barriers to attendance.",
+            "priority": 1,
+        },
+    ],
+    "max_recommendations": 3,
+    "no_factors_explanation": "Student is performing well with no significant risk factors.",
+    "no_factors_recommendation": "Continue monitoring student progress.",
+}
+
+# Metrics a rule may test (computed by risk_engine.score_aggregates)
+RULE_METRICS = {'avg_engagement', 'engagement_trend', 'completion_rate', 'homework_rate',
+                'attendance_rate', 'total_sessions', 'days_since_last'}
+
+_OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+
+class RuleSet:
+    """A validated rule set compiled into vectorized expressions"""
+
+    def __init__(self, config):
+        self.config = config
+        self.name = config.get("name", "rules")
+        self.expected_sessions = config["expected_sessions"]
+        self.rules = config["rules"]
+        if len(self.rules) > 64:
+            raise ValueError(f"rule set {self.name!r} has more than 64 rules")
+        for rule in self.rules:
+            if rule["metric"] not in RULE_METRICS:
+                raise ValueError(f"unknown metric {rule['metric']!r} in rule set {self.name!r}")
+            if rule["op"] not in _OPERATORS:
+                raise ValueError(f"unknown operator {rule['op']!r} in rule set {self.name!r}")
+            if not rule["tiers"]:
+                raise ValueError(f"rule on {rule['metric']!r} has no tiers")
+        self.factor_labels = [rule["factor"] for rule in self.rules]
+        # (metric, comparison, threshold) of each rule's first tier, for one student
+        self._factor_tests = [(rule["metric"], _OPERATORS[rule["op"]], rule["tiers"][0]["value"])
+                              for rule in self.rules]
+        self._levels = sorted(config["levels"], key=lambda level: -level["min_score"])
+        self._recommendation_order = sorted(range(len(self.rules)),
+                                            key=lambda i: self.rules[i].get("priority", i))
+        # Narrowest unsigned integer holding one bit per rule
+        self.mask_dtype = next(dtype for dtype in (np.uint8, np.uint16, np.uint32, np.uint64)
+                               if np.iinfo(dtype).bits >= len(self.rules))
+        self._factor_cache = {}
+        self.fingerprint = hashlib.sha256(
+            json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+
+    def _conditions(self, rule, value):
+        compare = _OPERATORS[rule["op"]]
+        return [compare(value, tier["value"]) for tier in rule["tiers"]]
+
+    def evaluate(self, metrics):
+        """Risk score, risk factor bitmask and risk level for a whole population.
+
+        metrics maps each metric name to a NumPy array (one entry per
+        student); bit i of the mask is set when rule i's first tier matched.
+        """
+        n = len(next(iter(metrics.values())))
+        risk_score = np.zeros(n, dtype=np.int64)
+        factor_mask = np.zeros(n, dtype=np.int64)
+        for bit, rule in enumerate(self.rules):
+            conditions = self._conditions(rule, metrics[rule["metric"]])
+            risk_score += np.select(conditions, [tier["points"] for tier in rule["tiers"]], 0).astype(np.int64)
+            factor_mask |= conditions[0].astype(np.int64) << bit
+        risk_level = np.select([risk_score >= level["min_score"] for level in self._levels],
+                               [level["level"] for level in self._levels],
+                               self.config["default_level"]).astype(object)
+        return risk_score, factor_mask, risk_level
+
+    def factors(self, mask):
+        """Risk factor labels of one factor bitmask, in rule order"""
+        mask = int(mask)
+        if mask not in self._factor_cache:
+            self._factor_cache[mask] = [label for bit, label in enumerate(self.factor_labels)
+                                        if mask >> bit & 1]
+        return list(self._factor_cache[mask])
+
+    def matched(self, student_metrics):
+        """Indices of the rules whose first tier matches one student's metrics"""
+        return [i for i, (metric, compare, threshold) in enumerate(self._factor_tests)
+                if compare(student_metrics[metric], threshold)]
+
+    def explain(self, student_metrics):
+        """One explanation sentence per matched rule, in rule order"""
+        sentences = []
+        for i in self.matched(student_metrics):
+            value = student_metrics[self.rules[i]["metric"]]
+            sentences.append(self.rules[i]["explanation"].format(value=value, magnitude=abs(value)))
+        return " ".join(sentences) if sentences else self.config["no_factors_explanation"]
+
+    def recommend(self, student_metrics):
+        """The highest-priority interventions for the matched rules"""
+        matched = set(self.matched(student_metrics))
+        recommendations = [self.rules[i]["recommendation"]
+                           for i in self._recommendation_order if i in matched]
+        recommendations = recommendations[:self.config.get("max_recommendations", 3)]
+        return "\n\n".join(recommendations) if recommendations else self.config["no_factors_recommendation"]
+
+
+DEFAULT_RULE_SET = RuleSet(DEFAULT_RULES)
+
+
+def load_rule_set(path=None):
+    """The rule set in a JSON file, or the default rule set when path is None"""
+    if path is None:
+        return DEFAULT_RULE_SET
+    with open(path) as rules_file:
+        return RuleSet(json.load(rules_file))
+
+
+if __name__ == "__main__":
+    json.dump(DEFAULT_RULES, sys.stdout, indent=2, ensure_ascii=False)
+    print()
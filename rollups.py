@@ -0,0 +1,144 @@
+"""
+Weekly cohort rollups for the overview analytics
+
+Sessions are summed per (ISO year, ISO week, grade, risk level, subject,
+tutor): session count plus engagement, completion and homework sums, each
+with the number of sessions that reported it (live events may leave them out). The
+table grows with the number of weeks and cohorts, not with session history,
+so charts and drill-downs read it in constant time. It is maintained
+incrementally: new sessions are added to it, and when a student's risk level
+changes only that student's sessions are moved to the new bucket.
+"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+ROLLUP_KEYS = ['iso_year', 'iso_week', 'grade_level', 'risk_level', 'subject', 'tutor_id']
+ROLLUP_VALUES = ['sessions', 'engagement_sum', 'engagement_count', 'completed_sum', 'completed_count',
+                 'homework_sum', 'homework_count']
+
+# Drill-down dimensions and their display names
+COHORT_DIMENSIONS = {
+    'grade_level': "Grade",
+    'risk_level': "Risk level",
+    'subject': "Subject",
+    'tutor_id': "Tutor",
+}
+
+
+def iso_weeks(dates):
+    """ISO year and week number of each date, vectorized"""
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    weekday = (days + 3) % 7  # Monday = 0; 1970-01-01 was a Thursday
+    thursday = (days - weekday + 3).astype('datetime64[D]')
+    year_start = thursday.astype('datetime64[Y]')
+    iso_week = (thursday - year_start.astype('datetime64[D]')).astype(np.int64) // 7 + 1
+    return year_start.astype(np.int64) + 1970, iso_week
+
+
+def rollup_sessions(sessions, risk_levels):
+    """Per-cohort counts and sums of a session frame.
+
+    risk_levels maps each student_id to the risk level their sessions are
+    counted under.
+    """
+    if sessions.empty:
+        return pd.DataFrame(columns=ROLLUP_KEYS + ROLLUP_VALUES).set_index(ROLLUP_KEYS)
+    iso_year, iso_week = iso_weeks(sessions['session_date'].to_numpy())
+    keys = {
+        'iso_year': iso_year,
+        'iso_week': iso_week,
+        'grade_level': sessions['grade_level'],
+        'risk_level': pd.Series(risk_levels).reindex(sessions['student_id']),
+        'subject': sessions['subject'],
+        'tutor_id': sessions['tutor_id'],
+    }
+
+    # Fold the key columns into one mixed-radix integer per session, so the
+    # grouping needs a few integer arrays rather than a wide frame; a missing
+    # key (e.g. an event without a tutor) is a cohort value of its own
+    cohort = np.zeros(len(sessions), dtype=np.int64)
+    levels = {}
+    for name, values in keys.items():
+        codes, levels[name] = pd.factorize(values, use_na_sentinel=False)
+        cohort = cohort * len(levels[name]) + codes
+    group, cohorts = pd.factorize(cohort)
+
+    n_groups = len(cohorts)
+    sums = {'sessions': np.bincount(group, minlength=n_groups)}
+    for name, column in [('engagement', 'engagement_score'), ('completed', 'completed'),
+                         ('homework', 'homework_completed')]:
+        values = sessions[column].to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        sums[f'{name}_sum'] = np.bincount(group, np.where(present, values, 0.0), n_groups)
+        sums[f'{name}_count'] = np.bincount(group, present, n_groups).astype(np.int64)
+    for name in ('completed_sum', 'homework_sum'):
+        sums[name] = sums[name].astype(np.int64)
+
+    # Decode each cohort's integer back into its key values
+    index = []
+    for name in reversed(ROLLUP_KEYS):
+        cohorts, codes = np.divmod(cohorts, len(levels[name]))
+        index.append(np.asarray(levels[name])[codes])
+    index = pd.MultiIndex.from_arrays(index[::-1], names=ROLLUP_KEYS)
+    return pd.DataFrame(sums, index=index)
+
+
+def _rates(grouped):
+    """Averages and rates from summed rollup columns"""
+    return pd.DataFrame({
+        'sessions': grouped['sessions'].astype(np.int64),
+        'avg_engagement': grouped['engagement_sum'] / grouped['engagement_count'].replace(0, np.nan),
+        'completion_rate': grouped['completed_sum'] / grouped['completed_count'].replace(0, np.nan),
+        'homework_rate': grouped['homework_sum'] / grouped['homework_count'].replace(0, np.nan),
+    })
+
+
+class CohortRollup:
+    """Incrementally maintained weekly cohort table"""
+
+    def __init__(self, table=None):
+        self.table = table if table is not None else rollup_sessions(pd.DataFrame(), {})
+
+    @classmethod
+    def from_sessions(cls, sessions, risk_levels):
+        return cls(rollup_sessions(sessions, risk_levels))
+
+    def _combine(self, other, sign=1):
+        if other.empty:
+            return
+        table = self.table.add(other * sign, fill_value=0) if not self.table.empty else other * sign
+        self.table = table[table['sessions'] != 0]
+
+    def add(self, sessions, risk_levels):
+        """Fold newly arrived sessions in"""
+        self._combine(rollup_sessions(sessions, risk_levels))
+
+    def move(self, sessions, old_levels, new_levels):
+        """Re-bucket students whose risk level changed, given all their sessions"""
+        self._combine(rollup_sessions(sessions, old_levels), sign=-1)
+        self._combine(rollup_sessions(sessions, new_levels))
+
+    def select(self, risk_levels=None, grade_levels=None, subjects=None, tutors=None):
+        """Rollup rows matching the given filters (None means no filter)"""
+        table = self.table
+        for level, values in [('risk_level', risk_levels), ('grade_level', grade_levels),
+                              ('subject', subjects), ('tutor_id', tutors)]:
+            if values is not None:
+                table = table[table.index.get_level_values(level).isin(list(values))]
+        return table
+
+    def weekly(self, **filters):
+        """Per-week sessions, average engagement and rates, oldest week first"""
+        grouped = self.select(**filters).groupby(level=['iso_year', 'iso_week']).sum().sort_index()
+        weekly = _rates(grouped).reset_index()
+        weekly.insert(0, 'week_start', pd.to_datetime(
+            [date.fromisocalendar(int(year), int(week), 1)
+             for year, week in zip(weekly['iso_year'], weekly['iso_week'])]))
+        return weekly
+
+    def breakdown(self, by, **filters):
+        """Sessions, average engagement and rates per value of one dimension"""
+        return _rates(self.select(**filters).groupby(level=by).sum()).reset_index()
@@ -0,0 +1,258 @@
+"""
+Async HTTP score service
+
+Serves risk scores from an in-memory index so other systems can look
+students up without running the dashboard:
+
+    GET  /students                 every scored student_id
+    GET  /students/{student_id}    one student's metrics, explanation and recommendations
+    POST /students/scores          bulk lookup, body {"student_ids": [...]}
+    GET  /health                   data version and student count
+    GET  /metrics                  Prometheus text
+
+The session export is scored once at startup with the headless `scoring`
+module and re-scored in a worker thread when its size or modification time
+changes or the date moves on (days since the last session, and so the
+inactivity factor and risk level, depend on it), so lookups never wait on
+pandas. Each student's JSON is built on the
+first request for it and reused until the next refresh. Only the standard
+library's asyncio is used for HTTP (HTTP/1.1 with keep-alive):
+
+    python score_service.py --data tutoring_data.csv --port 8080
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from datetime import date
+
+import perf
+from risk_engine import SESSION_COLUMNS
+from scoring import RiskMetricStore, load_rule_set, student_record
+from session_io import DEFAULT_DATA_FILE, data_version, load_sessions
+
+logger = logging.getLogger("score_service")
+
+MAX_BULK_IDS = 10_000
+MAX_BODY_BYTES = 1 << 20
+REFRESH_SECONDS = 30
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class ScoreIndex:
+    """Scored students keyed by student_id, serialized on first lookup"""
+
+    def __init__(self, metrics, version=None, rules=None, scored_on=None):
+        self.version = version
+        self.rules = rules
+        self.scored_on = scored_on
+        self._metrics = metrics
+        self._positions = dict(zip(metrics['student_id'], range(len(metrics))))
+        self._encoded = {}
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, student_id):
+        return student_id in self._positions
+
+    @property
+    def student_ids(self):
+        return list(self._positions)
+
+    def encoded(self, student_id):
+        """A student's record as JSON bytes, or None if the student is unknown"""
+        encoded = self._encoded.get(student_id)
+        if encoded is None:
+            position = self._positions.get(student_id)
+            if position is None:
+                return None
+            record = student_record(self._metrics.iloc[position], self.rules)
+            encoded = self._encoded[student_id] = json.dumps(record).encode()
+        return encoded
+
+    def bulk(self, student_ids):
+        """JSON body for a bulk lookup; unknown ids are listed under "missing" """
+        found, missing = [], []
+        for student_id in student_ids:
+            encoded = self.encoded(student_id)
+            if encoded is None:
+                missing.append(student_id)
+            else:
+                found.append(encoded)
+        return (b'{"students":[' + b",".join(found) + b'],"missing":'
+                + json.dumps(missing).encode() + b"}")
+
+
+class ScoreService:
+    """Keeps a ScoreIndex current with a session export and answers requests"""
+
+    def __init__(self, path=DEFAULT_DATA_FILE, workers=1, rules=None):
+        self.path = path
+        self.store = RiskMetricStore(workers=workers, rules=rules)
+        self.index = None
+
+    def _score(self, version, today):
+        with perf.span("score_service_load"):
+            if self.index is not None and version == self.index.version:
+                # Same export on a new day: re-score from the store's aggregates
+                metrics = self.store.metrics().copy()
+            else:
+                sessions = load_sessions(self.path, columns=SESSION_COLUMNS)
+                # The index keeps its own copy: the store updates its frame in place
+                metrics = self.store.sync(sessions).copy()
+        return ScoreIndex(metrics, version, self.store.rules, today)
+
+    async def refresh(self):
+        """Re-score in a worker thread if the export or the date changed; True if either did"""
+        version, today = data_version(self.path), date.today()
+        if version is None or (self.index is not None
+                               and (version, today) == (self.index.version, self.index.scored_on)):
+            return False
+        self.index = await asyncio.to_thread(self._score, version, today)
+        logger.info("Scored %d students (data version %s, %s)", len(self.index), version, today)
+        return True
+
+    async def refresh_forever(self, interval=REFRESH_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Refresh failed; serving the previous scores")
+
+    def handle(self, method, path, body):
+        """(status, content type, body bytes) for one request"""
+        index = self.index
+        if path == "/health":
+            return 200, "application/json", json.dumps({
+                "status": "ok" if index is not None else "loading",
+                "data_version": index.version if index is not None else None,
+                "students": len(index) if index is not None else 0,
+                "rule_set": self.store.rules.name,
+            }).encode()
+        if path == "/metrics":
+            return 200, "text/plain; version=0.0.4", perf.prometheus_text().encode()
+        if index is None:
+            return _error(503, "Scores are still loading")
+
+        if path == "/students":
+            return 200, "application/json", json.dumps({"student_ids": index.student_ids}).encode()
+
+        if path.startswith("/students/") and path != "/students/scores":
+            if method != "GET":
+                return _error(405, "Use GET")
+            perf.count("score_service_lookups")
+            encoded = index.encoded(path[len("/students/"):])
+            if encoded is None:
+                return _error(404, "Unknown student")
+            return 200, "application/json", encoded
+
+        if path == "/students/scores":
+            if method != "POST":
+                return _error(405, "Use POST")
+            try:
+                student_ids = json.loads(body)["student_ids"]
+            except (ValueError, KeyError, TypeError):
+                return _error(400, 'Expected a JSON body {"student_ids": [...]}')
+            if not isinstance(student_ids, list) or not all(isinstance(s, str) for s in student_ids):
+                return _error(400, "student_ids must be a list of strings")
+            if len(student_ids) > MAX_BULK_IDS:
+                return _error(413, f"At most {MAX_BULK_IDS} student_ids per request")
+            perf.count("score_service_bulk_lookups")
+            perf.count("score_service_lookups", len(student_ids))
+            return 200, "application/json", index.bulk(student_ids)
+
+        return _error(404, "Not found")
+
+    async def serve_connection(self, reader, writer):
+        """Answer requests on one keep-alive connection until it closes"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await _respond(writer, *_error(400, "Malformed request line"), keep_alive=False)
+                    break
+
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await _respond(writer, *_error(400, "Invalid Content-Length"), keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await _respond(writer, *_error(413, "Request body too large"), keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                with perf.span("score_service_request"):
+                    response = self.handle(method, target.split("?", 1)[0], body)
+                await _respond(writer, *response, keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _error(status, message):
+    return status, "application/json", json.dumps({"error": message}).encode()
+
+
+async def _respond(writer, status, content_type, body, keep_alive=True):
+    writer.write(
+        f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+
+
+async def serve(path=DEFAULT_DATA_FILE, host="127.0.0.1", port=8080, refresh_seconds=REFRESH_SECONDS,
+                rules=None):
+    service = ScoreService(path, rules=rules)
+    await service.refresh()
+    server = await asyncio.start_server(service.serve_connection, host, port)
+    logger.info("Serving scores for %s on http://%s:%d", path, host, port)
+    refresher = asyncio.create_task(service.refresh_forever(refresh_seconds)) if refresh_seconds else None
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if refresher is not None:
+            refresher.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve student risk scores over HTTP")
+    parser.add_argument("--data", default=DEFAULT_DATA_FILE, help="session export (CSV or Parquet)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--refresh-seconds", type=float, default=REFRESH_SECONDS,
+                        help="how often to check the export for changes (0 disables)")
+    parser.add_argument("--rules", default=os.environ.get("RISK_RULES_FILE"),
+                        help="risk rule set JSON file (default: built-in rules)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    try:
+        asyncio.run(serve(args.data, args.host, args.port, args.refresh_seconds, load_rule_set(args.rules)))
+    except KeyboardInterrupt:
+        pass
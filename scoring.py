@@ -0,0 +1,56 @@
+"""
+Headless risk scoring
+
+Everything other systems need to score students without Streamlit or Plotly:
+the vectorized risk metrics plus the rule-based explanations and
+recommendations the dashboard falls back to, all driven by one rule set
+(`risk_rules`). Only pandas and NumPy are
+imported.
+"""
+
+import math
+
+from risk_engine import (METRIC_COLUMNS, OUTPUT_COLUMNS, RiskMetricStore, calculate_risk_metrics,
+                         compare_rule_sets, decode_risk_factors)
+from risk_rules import DEFAULT_RULE_SET, RuleSet, load_rule_set
+
+__all__ = [
+    'METRIC_COLUMNS', 'OUTPUT_COLUMNS', 'RiskMetricStore', 'calculate_risk_metrics',
+    'compare_rule_sets', 'decode_risk_factors',
+    'DEFAULT_RULE_SET', 'RuleSet', 'load_rule_set',
+    'generate_rule_based_explanation', 'generate_rule_based_recommendations',
+    'student_record',
+]
+
+
+def generate_rule_based_explanation(student_metrics, student_data=None, rules=None):
+    """Rule-based explanation of a student's risk factors
+
+    student_data is accepted for parity with the AI explanation and unused.
+    """
+    return (rules or DEFAULT_RULE_SET).explain(student_metrics)
+
+
+def generate_rule_based_recommendations(student_metrics, rules=None):
+    """Up to three rule-based interventions for a student"""
+    return (rules or DEFAULT_RULE_SET).recommend(student_metrics)
+
+
+def _json_value(value):
+    if hasattr(value, 'item'):  # NumPy scalar
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def student_record(student_metrics, rules=None):
+    """JSON-ready dict of a student's metrics, explanation and recommendations"""
+    record = {column: _json_value(student_metrics[column])
+              for column in METRIC_COLUMNS if column != 'risk_factor_mask'}
+    record['risk_factors'] = (rules or DEFAULT_RULE_SET).factors(student_metrics['risk_factor_mask'])
+    record['explanation'] = generate_rule_based_explanation(student_metrics, rules=rules)
+    record['recommendations'] = generate_rule_based_recommendations(student_metrics, rules)
+    return record
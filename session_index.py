@@ -0,0 +1,55 @@
+"""
+Per-student session index
+
+Built once per data load: the row positions of the sessions sorted by
+(student_id, session_date) plus each student's range in that order, so a
+student's sessions are a `take` of a few rows instead of a boolean scan of the
+whole table. Only the positions are stored (four bytes a session), not a
+sorted copy of the frame.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class SessionIndex:
+    """Sessions grouped by student and ordered by date within each student.
+
+    The original row labels are kept, so a student's slice looks exactly like
+    the rows a `df[df['student_id'] == student_id]` filter would return
+    (sorted by date, ties in file order). The frame is referenced, not
+    copied, and must not be modified while the index is in use.
+    """
+
+    def __init__(self, sessions):
+        codes, student_ids = pd.factorize(sessions['student_id'])
+        order = np.lexsort((sessions['session_date'].to_numpy(), codes))
+        codes = codes[order]
+        self.sessions = sessions
+        self._order = order.astype(np.int32) if len(order) < 2**31 else order
+
+        starts = np.flatnonzero(np.diff(codes, prepend=-1))
+        stops = np.append(starts[1:], len(codes))
+        self._ranges = dict(zip(np.asarray(student_ids)[codes[starts]],
+                                zip(starts.tolist(), stops.tolist())))
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def __contains__(self, student_id):
+        return student_id in self._ranges
+
+    @property
+    def student_ids(self):
+        return list(self._ranges)
+
+    def sessions_for(self, student_id):
+        """A student's sessions in date order (empty if the student is unknown)"""
+        start, stop = self._ranges.get(student_id, (0, 0))
+        return self.sessions.take(self._order[start:stop])
+
+    def sessions_for_many(self, student_ids):
+        """The sessions of several students, grouped by student in the given order"""
+        ranges = [self._ranges[s] for s in student_ids if s in self._ranges]
+        positions = np.concatenate([self._order[start:stop] for start, stop in ranges]) if ranges else []
+        return self.sessions.take(positions)
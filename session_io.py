@@ -0,0 +1,207 @@
+"""
+Session data storage for the Student Risk Dashboard
+
+Sessions are kept in a columnar Parquet file next to the CSV export. Ids,
+names and subjects are dictionary-encoded, dates are native timestamps and
+reads project only the columns the dashboard uses. An existing CSV is
+converted automatically the first time it is loaded (or whenever it is newer
+than its Parquet copy). Without pyarrow everything falls back to a typed CSV
+read. Loaded frames are compacted: ids and names stay categorical, small
+integer columns are downcast and free-text notes are never read.
+"""
+
+import contextlib
+import os
+import tempfile
+
+import pandas as pd
+
+from risk_engine import SESSION_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+DEFAULT_DATA_FILE = "tutoring_data.csv"
+
+# Columns read by the dashboard (scoring, session tables, prompts and rollups)
+DASHBOARD_COLUMNS = SESSION_COLUMNS + ['subject', 'tutor_id']
+
+# Low-cardinality string columns stored as categoricals / dictionaries
+CATEGORICAL_COLUMNS = ['student_id', 'student_name', 'subject', 'tutor_id']
+
+CSV_BLOCK_SIZE = 64 << 20  # bytes of CSV parsed per batch during conversion
+BATCH_ROWS = 1_000_000  # rows per batch when streaming sessions
+
+# Integer columns narrowed to the smallest type holding their values
+DOWNCAST_COLUMNS = ['grade_level', 'engagement_score']
+
+
+def columnar_path(path):
+    """Parquet file that shadows a CSV export"""
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+def has_columnar_support():
+    return pa is not None
+
+
+@contextlib.contextmanager
+def _replacing(path):
+    """Yield a unique temporary path next to `path`, moved into place on success
+
+    Concurrent writers of the same file each get their own temporary file, so
+    a reader only ever sees one complete file. Nothing is left behind on error.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                    prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+def write_sessions(df, path):
+    """Write a session frame as CSV or Parquet depending on the extension"""
+    return write_session_batches([df], path)
+
+
+def _parquet_schema(df):
+    """Arrow schema with dictionary-encoded ids/names and nanosecond dates"""
+    column_types = {c: pa.dictionary(pa.int32(), pa.string()) for c in CATEGORICAL_COLUMNS}
+    column_types['session_date'] = pa.timestamp('ns')
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    return pa.schema([pa.field(f.name, column_types.get(f.name, f.type)) for f in schema])
+
+
+def write_session_batches(batches, path):
+    """Stream session frames into one CSV or Parquet file.
+
+    Only one batch is held in memory at a time. The file is written under a
+    temporary name and moved into place once complete.
+    """
+    with _replacing(path) as tmp_path:
+        writer = None
+        try:
+            for i, df in enumerate(batches):
+                if path.endswith(".parquet"):
+                    df = df.astype({c: 'category' for c in CATEGORICAL_COLUMNS if c in df.columns})
+                    if 'session_date' in df.columns:
+                        df['session_date'] = pd.to_datetime(df['session_date'])
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp_path, _parquet_schema(df))
+                    writer.write_table(pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False))
+                else:
+                    df.to_csv(tmp_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        finally:
+            if writer is not None:
+                writer.close()
+    return path
+
+
+def convert_csv_to_parquet(csv_path, parquet_path=None):
+    """Stream a CSV export into a typed, dictionary-encoded Parquet file"""
+    parquet_path = parquet_path or columnar_path(csv_path)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    column_types = {c: pa.dictionary(pa.int32(), pa.string()) for c in CATEGORICAL_COLUMNS if c in header}
+    if 'session_date' in header:
+        column_types['session_date'] = pa.timestamp('ns')
+
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(column_types=column_types),
+    )
+    # Write to a temporary file so a reader never sees a half-written file
+    with _replacing(parquet_path) as tmp_path, pq.ParquetWriter(tmp_path, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+    return parquet_path
+
+
+def data_version(path):
+    """Cheap fingerprint of a session export: size and modification time.
+
+    Returns None when neither the CSV nor its Parquet copy exist.
+    """
+    for candidate in (path, columnar_path(path)):
+        if os.path.exists(candidate):
+            stat = os.stat(candidate)
+            return f"{stat.st_size}-{stat.st_mtime_ns}"
+    return None
+
+
+def compact_sessions(df):
+    """Narrow a session frame's dtypes in place and return it.
+
+    Integer columns become int8/int16 where their values fit (a grade or a
+    1-10 score is one byte instead of eight) and string ids that slipped
+    through as objects become categoricals. Float columns, which may hold
+    NaN, are left alone so scores computed from them are unchanged.
+    """
+    for column in DOWNCAST_COLUMNS:
+        if column in df and pd.api.types.is_integer_dtype(df[column].dtype):
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+    for column in CATEGORICAL_COLUMNS:
+        if column in df and df[column].dtype == object:
+            df[column] = df[column].astype('category')
+    return df
+
+
+def load_sessions(path, columns=DASHBOARD_COLUMNS):
+    """Load the projected session columns, preferring the Parquet copy.
+
+    Raises FileNotFoundError when neither the CSV nor its Parquet copy exist.
+    """
+    parquet_path = path if path.endswith(".parquet") else columnar_path(path)
+    csv_exists = not path.endswith(".parquet") and os.path.exists(path)
+
+    if pa is not None:
+        stale = csv_exists and (not os.path.exists(parquet_path)
+                                or os.path.getmtime(path) > os.path.getmtime(parquet_path))
+        if stale:
+            convert_csv_to_parquet(path, parquet_path)
+        if os.path.exists(parquet_path):
+            table = pq.read_table(parquet_path, columns=columns)
+            # Release Arrow buffers column by column while converting
+            return compact_sessions(table.to_pandas(split_blocks=True, self_destruct=True))
+
+    if not csv_exists:
+        raise FileNotFoundError(path)
+    header = pd.read_csv(path, nrows=0).columns
+    return compact_sessions(pd.read_csv(
+        path,
+        usecols=columns,
+        dtype={c: 'category' for c in CATEGORICAL_COLUMNS if c in columns and c in header},
+        parse_dates=['session_date'],
+    )[list(columns)])
+
+
+def iter_sessions(path, columns=DASHBOARD_COLUMNS, batch_rows=BATCH_ROWS):
+    """Yield the projected session columns in frames of at most batch_rows.
+
+    Parquet files are memory-mapped and read batch by batch; CSV files are
+    parsed in chunks, so memory stays bounded whatever the file size.
+    """
+    if path.endswith(".parquet"):
+        parquet = pq.ParquetFile(path, memory_map=True)
+        for batch in parquet.iter_batches(batch_size=batch_rows, columns=columns):
+            yield compact_sessions(batch.to_pandas())
+        return
+
+    header = pd.read_csv(path, nrows=0).columns
+    for chunk in pd.read_csv(
+        path,
+        usecols=columns,
+        dtype={c: 'category' for c in CATEGORICAL_COLUMNS if c in columns and c in header},
+        parse_dates=['session_date'],
+        chunksize=batch_rows,
+    ):
+        yield compact_sessions(chunk)
@@ -0,0 +1,77 @@
+"""
+Streamed insights: stall detection and request slots
+
+    python -m unittest discover tests
+"""
+
+import threading
+import unittest
+from contextlib import contextmanager
+
+from ai_insights import StreamStalled, stream_complete
+from llm_client import InstrumentedClient
+
+
+class HangingStream:
+    """A stream that sends one chunk, then blocks until it is closed"""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    @property
+    def text_stream(self):
+        yield "Maya is "
+        self.closed.wait()
+        raise ConnectionError("stream closed")
+
+    def get_final_message(self):
+        raise AssertionError("an unfinished stream has no final message")
+
+    def close(self):
+        self.closed.set()
+
+
+class FakeStreamingMessages:
+    def __init__(self):
+        self.streams = []
+        self.calls = []
+        self.exited = threading.Event()
+
+    @contextmanager
+    def stream(self, **kwargs):
+        self.calls.append(kwargs)
+        stream = HangingStream()
+        self.streams.append(stream)
+        try:
+            yield stream
+        finally:
+            self.exited.set()
+
+
+class FakeStreamingClient:
+    def __init__(self):
+        self.messages = FakeStreamingMessages()
+
+
+class StreamStallTest(unittest.TestCase):
+
+    def test_stalled_stream_gives_back_its_slot(self):
+        fake = FakeStreamingClient()
+        client = InstrumentedClient(fake, max_concurrent=1, stream_timeout=0.2)
+        parts = []
+        with self.assertRaises(StreamStalled):
+            for text in stream_complete(client, "prompt", 100, first_token_timeout=1, stall_timeout=0.1):
+                parts.append(text)
+
+        self.assertEqual(parts, ["Maya is "])
+        self.assertTrue(fake.messages.streams[0].closed.is_set())
+        self.assertTrue(fake.messages.exited.wait(1))
+        # The only request slot is free again for the next call
+        self.assertTrue(client.messages._semaphore.acquire(timeout=1))
+        client.messages._semaphore.release()
+        self.assertEqual(client.metrics.snapshot()["errors"], 1)
+        self.assertEqual(fake.messages.calls[0]["timeout"], 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
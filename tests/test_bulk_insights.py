@@ -0,0 +1,112 @@
+"""
+Bulk insights: profile deduplication, fan-out and batch handling
+
+Runs end to end against FakeBatchClient, with no API key.
+
+    python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+import ai_insights
+from bulk_insights import FakeBatchClient, bulk_generate, metric_profile, plan_bulk, run_batches
+from generate_data import generate_tutoring_data
+from llm_cache import ResponseCache
+from risk_engine import calculate_risk_metrics, decode_risk_factors
+from session_index import SessionIndex
+
+NOW = pd.Timestamp("2025-06-01")
+
+
+class BulkInsightsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = generate_tutoring_data(os.path.join(workdir, "sessions.csv"), students=200, seed=11)
+            sessions = pd.read_csv(path, parse_dates=['session_date'])
+        cls.sessions = SessionIndex(sessions)
+        cls.students = decode_risk_factors(calculate_risk_metrics(sessions, now=NOW))
+        cls.profiles = {metric_profile(row) for _, row in cls.students.iterrows()}
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.cache = ResponseCache(os.path.join(workdir.name, "responses.sqlite"))
+        self.addCleanup(self.cache.close)
+
+    def student_keys(self, row):
+        return (ai_insights.response_key(
+                    ai_insights.explanation_prompt(row, self.sessions.sessions_for(row['student_id'])),
+                    ai_insights.EXPLANATION_MAX_TOKENS),
+                ai_insights.response_key(ai_insights.recommendations_prompt(row),
+                                         ai_insights.RECOMMENDATIONS_MAX_TOKENS))
+
+    def test_plan_shares_one_request_per_profile(self):
+        requests, already_cached = plan_bulk(self.students, self.sessions, self.cache)
+
+        self.assertLess(len(self.profiles), len(self.students))
+        self.assertEqual(len(requests), 2 * len(self.profiles))
+        self.assertEqual(sum(len(request["keys"]) for request in requests.values()), 2 * len(self.students))
+        self.assertEqual(already_cached, 0)
+
+    def test_fans_responses_out_to_every_student(self):
+        client = FakeBatchClient()
+        summary = bulk_generate(client, self.students, self.sessions, self.cache, poll_seconds=0)
+
+        self.assertEqual(summary["generated"], 2 * len(self.students))
+        self.assertEqual(summary["profile_prompts"], 2 * len(self.profiles))
+        self.assertEqual(sum(len(batch) for batch in client.submitted), 2 * len(self.profiles))
+        by_profile = {}
+        for _, row in self.students.iterrows():
+            texts = tuple(self.cache.get(key) for key in self.student_keys(row))
+            self.assertNotIn(None, texts)
+            # Students with one profile are served the same responses
+            self.assertEqual(by_profile.setdefault(metric_profile(row), texts), texts)
+
+    def test_failed_requests_are_counted_and_not_cached(self):
+        requests, _ = plan_bulk(self.students, self.sessions, self.cache)
+        failed_id = max(requests, key=lambda custom_id: len(requests[custom_id]["keys"]))
+        failed_keys = requests[failed_id]["keys"]
+
+        summary = bulk_generate(FakeBatchClient(fail_ids=[failed_id]), self.students, self.sessions,
+                                self.cache, poll_seconds=0)
+
+        self.assertEqual(summary["failed"], len(failed_keys))
+        self.assertEqual(summary["generated"], 2 * len(self.students) - len(failed_keys))
+        self.assertFalse(any(self.cache.peek(key) for key in failed_keys))
+        self.assertEqual(len(self.cache), summary["generated"] + len(requests) - 1)
+
+    def test_rerun_is_served_from_the_cache(self):
+        bulk_generate(FakeBatchClient(), self.students, self.sessions, self.cache, poll_seconds=0)
+        client = FakeBatchClient()
+        summary = bulk_generate(client, self.students, self.sessions, self.cache, poll_seconds=0)
+
+        self.assertEqual(summary["cached"], 2 * len(self.students))
+        self.assertEqual(summary["generated"], 0)
+        self.assertEqual(summary["profile_prompts"], 0)
+        self.assertEqual(client.submitted, [])
+
+    def test_timeout_cancels_the_batch(self):
+        requests, _ = plan_bulk(self.students, self.sessions, self.cache)
+        client = FakeBatchClient(polls_until_done=1_000)
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        with mock.patch.object(client, "cancel", wraps=client.cancel) as cancel:
+            with self.assertRaises(TimeoutError):
+                list(run_batches(client, requests, poll_seconds=60, timeout=300,
+                                 clock=lambda: now[0], sleep=sleep))
+        cancel.assert_called_once_with("msgbatch_fake_1")
+        self.assertLessEqual(now[0], 360)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Live ingestion: drop directory tailing and incremental scores
+
+    python -m unittest discover tests
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+from unittest import mock
+
+import pandas as pd
+
+import ingest
+from generate_data import generate_tutoring_data
+from ingest import DropDirectoryTailer, LiveScores
+
+NOW = pd.Timestamp("2025-06-01")
+
+
+def sample_sessions():
+    with tempfile.TemporaryDirectory() as workdir:
+        path = generate_tutoring_data(os.path.join(workdir, "sessions.csv"), students=20, seed=3)
+        return pd.read_csv(path, parse_dates=['session_date'])
+
+
+class LiveScoresTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sessions = sample_sessions()
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+
+    def write_events(self, events, name="events.jsonl"):
+        with open(os.path.join(self.workdir.name, name), "a") as events_file:
+            for event in events:
+                events_file.write(json.dumps(event) + "\n")
+
+    def live(self):
+        return LiveScores(self.sessions, DropDirectoryTailer(self.workdir.name), now=NOW)
+
+    def session_count(self, live, student_id):
+        return len(live.sessions_for(student_id))
+
+    def test_concurrent_polls_read_each_event_once(self):
+        live = self.live()
+        before = self.session_count(live, "STU-001")
+        self.write_events([{"student_id": "STU-001", "session_date": "2025-05-30", "engagement_score": 5,
+                            "completed": True, "homework_completed": True}] * 10)
+
+        # Widen the window between reading a file's size and its offset
+        getsize = os.path.getsize
+
+        def slow_getsize(path):
+            time.sleep(0.05)
+            return getsize(path)
+
+        with mock.patch.object(ingest.os.path, "getsize", slow_getsize):
+            threads = [threading.Thread(target=live.poll, kwargs={"now": NOW}) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(live.events_ingested, 10)
+        self.assertEqual(self.session_count(live, "STU-001"), before + 10)
+        self.assertEqual(live.metrics(NOW).set_index('student_id').loc["STU-001", 'total_sessions'], before + 10)
+
+    def test_partial_line_waits_for_next_poll(self):
+        live = self.live()
+        path = os.path.join(self.workdir.name, "events.jsonl")
+        line = json.dumps({"student_id": "STU-002", "session_date": "2025-05-30", "engagement_score": 4})
+        with open(path, "w") as events_file:
+            events_file.write(line[:10])
+        live.poll(NOW)
+        self.assertEqual(live.events_ingested, 0)
+        with open(path, "a") as events_file:
+            events_file.write(line[10:] + "\n")
+        live.poll(NOW)
+        self.assertEqual(live.events_ingested, 1)
+
+    def test_events_without_completion_fields(self):
+        live = self.live()
+        self.write_events([{"student_id": "STU-003", "session_date": "2025-05-30", "engagement_score": 6}])
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            live.poll(NOW)
+        self.assertEqual(live.events_ingested, 1)
+        # A week where no session reported completion has no rate at all
+        weekly = live.rollup.weekly().set_index('week_start')
+        for rate in ('completion_rate', 'homework_rate'):
+            self.assertTrue(weekly[rate].dropna().between(0, 1).all())
+            self.assertTrue(pd.isna(weekly.loc[pd.Timestamp("2025-05-26"), rate]))
+        self.assertGreaterEqual(live.rollup.table[['completed_sum', 'homework_sum']].min().min(), 0)
+
+    def test_new_day_publishes_level_changes(self):
+        # Start the day after the last session, when nobody is inactive yet
+        today = self.sessions['session_date'].max() + pd.Timedelta(days=1)
+        live = LiveScores(self.sessions, DropDirectoryTailer(self.workdir.name), now=today)
+        published = []
+        live.subscribe(published.extend)
+        before = live.metrics(today).set_index('student_id')['risk_level']
+        version = live.version
+
+        later = today + pd.Timedelta(days=60)
+        changes = live.poll(later)  # no events: the day change alone re-levels students
+        after = live.metrics(later).set_index('student_id')['risk_level']
+
+        moved = set(after.index[after != before.loc[after.index]])
+        self.assertTrue(moved)
+        self.assertEqual({change['student_id'] for change in changes}, moved)
+        self.assertEqual(published, changes)
+        self.assertEqual(list(live.recent_changes)[:len(changes)], changes[::-1])
+        for change in changes:
+            self.assertEqual(change['old_level'], before[change['student_id']])
+            self.assertEqual(change['new_level'], after[change['student_id']])
+        self.assertGreater(live.version, version)
+        self.assertEqual(live.poll(later), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Response cache: TTL expiry, LRU eviction and counters
+
+Runs against a temporary SQLite file with a fake clock.
+
+    python -m unittest discover tests
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from llm_cache import ResponseCache
+
+
+class FakeClock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.path = os.path.join(workdir.name, "responses.sqlite")
+        self.clock = FakeClock()
+
+    def open_cache(self, **kwargs):
+        cache = ResponseCache(self.path, clock=self.clock, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_entries_expire_after_ttl(self):
+        cache = self.open_cache(ttl_seconds=60)
+        cache.set("a", "response a")
+        self.clock.advance(60)
+        self.assertTrue(cache.peek("a"))
+        self.assertEqual(cache.get("a"), "response a")
+        self.clock.advance(1)
+        self.assertFalse(cache.peek("a"))
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_expired_entries_are_evicted_on_write(self):
+        cache = self.open_cache(ttl_seconds=60)
+        cache.set("a", "response a")
+        self.clock.advance(61)
+        cache.set("b", "response b")
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_least_recently_used_are_evicted_first(self):
+        cache = self.open_cache(max_entries=3)
+        for key in ("a", "b", "c"):
+            cache.set(key, f"response {key}")
+            self.clock.advance(1)
+        cache.get("a")  # a is now more recent than b and c
+        self.clock.advance(1)
+        cache.set("d", "response d")
+        self.clock.advance(1)
+        cache.set("e", "response e")
+
+        self.assertEqual([key for key in "abcde" if cache.peek(key)], ["a", "d", "e"])
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    def test_counters(self):
+        cache = self.open_cache(max_entries=1)
+        cache.set("a", "response a")
+        cache.get("a")
+        cache.get("a")
+        cache.get("missing")
+        cache.peek("a")
+        self.clock.advance(1)
+        cache.set("b", "response b")
+
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 1, "hit_rate": 2 / 3, "evictions": 1,
+                                         "entries": 1})
+
+    def test_entries_survive_a_restart(self):
+        cache = self.open_cache()
+        cache.set_many([("a", "response a"), ("b", "response b")])
+        cache.close()
+        self.assertEqual(self.open_cache().get("b"), "response b")
+
+    def test_set_many_rolls_back_on_error(self):
+        cache = self.open_cache()
+        cache.set("a", "response a")
+
+        def items():
+            yield "b", "response b"
+            yield "c", None  # violates NOT NULL
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            cache.set_many(items())
+        self.assertEqual(len(cache), 1)
+        self.assertFalse(cache.peek("b"))
+        # The connection is usable again after the rollback
+        cache.set_many([("b", "response b")])
+        self.assertEqual(cache.get("b"), "response b")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+"""
+Nightly pre-generation: retries, shared rate-limit pauses and cached jobs
+
+Runs against an in-process fake of the async Messages API whose responses are
+scripted per prompt.
+
+    python -m unittest discover tests
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import ai_insights
+import pregenerate_insights
+from llm_cache import ResponseCache
+from pregenerate_insights import pregenerate
+
+
+class FakeAPIError(Exception):
+    """Carries a status code and headers like anthropic.APIStatusError"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class FakeAsyncMessages:
+    """Plays back a script of errors and texts per prompt, then "ok <prompt>"
+
+    Every call is logged with its prompt and monotonic start time.
+    """
+
+    def __init__(self, scripts):
+        self.scripts = {prompt: list(outcomes) for prompt, outcomes in scripts.items()}
+        self.calls = []
+
+    async def create(self, model, max_tokens, messages):
+        prompt = messages[0]["content"]
+        self.calls.append((prompt, time.monotonic()))
+        await asyncio.sleep(0)
+        script = self.scripts.get(prompt)
+        outcome = script.pop(0) if script else f"ok {prompt}"
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(content=[SimpleNamespace(text=outcome)])
+
+    def call_times(self, prompt):
+        return [start for called, start in self.calls if called == prompt]
+
+
+class FakeAsyncClient:
+    def __init__(self, scripts=None):
+        self.messages = FakeAsyncMessages(scripts or {})
+
+
+def job(prompt):
+    return ("STU-001", "explanation", prompt, ai_insights.EXPLANATION_MAX_TOKENS)
+
+
+class PregenerateTest(unittest.TestCase):
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.cache = ResponseCache(os.path.join(workdir.name, "responses.sqlite"))
+        self.addCleanup(self.cache.close)
+        # No jitter, so backoff delays are exactly base_delay * 2 ** attempt
+        patcher = mock.patch.object(pregenerate_insights.random, "random", return_value=0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_jobs(self, client, jobs, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            summary = asyncio.run(pregenerate(client, jobs, self.cache, **kwargs))
+        self.output = output.getvalue()
+        return summary
+
+    def cached(self, prompt):
+        return ai_insights.is_cached(self.cache, prompt, ai_insights.EXPLANATION_MAX_TOKENS)
+
+    def test_retries_transient_errors_with_backoff(self):
+        client = FakeAsyncClient({"a": [FakeAPIError(503), FakeAPIError(529), "explained"]})
+        summary = self.run_jobs(client, [job("a")], base_delay=0.05)
+
+        self.assertEqual(summary, {"generated": 1, "cached": 0, "failed": 0})
+        first, second, third = client.messages.call_times("a")
+        self.assertGreaterEqual(second - first, 0.05)
+        self.assertGreaterEqual(third - second, 0.10)
+        key = ai_insights.response_key("a", ai_insights.EXPLANATION_MAX_TOKENS)
+        self.assertEqual(self.cache.get(key), "explained")
+
+    def test_gives_up_after_max_retries(self):
+        client = FakeAsyncClient({"a": [FakeAPIError(500)] * 10})
+        summary = self.run_jobs(client, [job("a")], max_retries=2, base_delay=0.001)
+
+        self.assertEqual(summary, {"generated": 0, "cached": 0, "failed": 1})
+        self.assertEqual(len(client.messages.calls), 3)
+        self.assertFalse(self.cached("a"))
+
+    def test_non_retryable_error_fails_once(self):
+        client = FakeAsyncClient({"bad": [FakeAPIError(400)]})
+        summary = self.run_jobs(client, [job("bad"), job("good")], base_delay=0.001)
+
+        self.assertEqual(summary, {"generated": 1, "cached": 0, "failed": 1})
+        self.assertEqual(len(client.messages.call_times("bad")), 1)
+        self.assertIn("HTTP 400", self.output)
+        self.assertFalse(self.cached("bad"))
+        self.assertTrue(self.cached("good"))
+
+    def test_rate_limit_pauses_every_worker(self):
+        # "limited" is told to wait 0.3 s; "busy" fails at the same moment and
+        # would retry after its own 0.01 s backoff without the shared pause
+        client = FakeAsyncClient({"limited": [FakeAPIError(429, {"retry-after": "0.3"})],
+                                  "busy": [FakeAPIError(503)]})
+        summary = self.run_jobs(client, [job("limited"), job("busy")], concurrency=2, base_delay=0.01)
+
+        self.assertEqual(summary, {"generated": 2, "cached": 0, "failed": 0})
+        limited_at = client.messages.call_times("limited")[0]
+        retries = client.messages.call_times("limited")[1:] + client.messages.call_times("busy")[1:]
+        self.assertEqual(len(retries), 2)
+        for start in retries:
+            self.assertGreaterEqual(start - limited_at, 0.3)
+
+    def test_skips_cached_jobs(self):
+        self.run_jobs(FakeAsyncClient(), [job("a")])
+        client = FakeAsyncClient()
+        summary = self.run_jobs(client, [job("a"), job("b")])
+
+        self.assertEqual(summary, {"generated": 1, "cached": 1, "failed": 0})
+        self.assertEqual([prompt for prompt, _ in client.messages.calls], ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+"""
+Equivalence of the vectorized risk engine with the original per-student loop
+
+The loop below is the dashboard's first `calculate_risk_metrics`, kept as the
+reference. Its only changes are a fixed `now` and a stable sort: the original
+`sort_values('session_date')` left sessions on the same day in arbitrary
+order, which moves them between the first and last trend windows. The engine
+orders same-day sessions by file position, as the stable sort does.
+
+    python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import risk_engine
+from generate_data import generate_tutoring_data
+from risk_engine import (OUTPUT_COLUMNS, RiskMetricStore, calculate_risk_metrics, decode_risk_factors,
+                         score_session_batches)
+
+NOW = pd.Timestamp("2025-06-01")
+
+
+def reference_risk_metrics(df, now):
+    """The original loop implementation of calculate_risk_metrics"""
+    student_metrics = []
+
+    for student_id in df['student_id'].unique():
+        student_data = df[df['student_id'] == student_id].sort_values('session_date', kind='stable')
+
+        # Calculate key metrics
+        total_sessions = len(student_data)
+        avg_engagement = student_data['engagement_score'].mean()
+        completion_rate = student_data['completed'].mean()
+        homework_rate = student_data['homework_completed'].mean()
+
+        # Calculate engagement trend (last 4 weeks vs first 4 weeks)
+        recent_data = student_data.tail(8)
+        early_data = student_data.head(8)
+        engagement_trend = recent_data['engagement_score'].mean() - early_data['engagement_score'].mean()
+
+        # Calculate attendance consistency
+        expected_sessions = 24  # 12 weeks * 2 sessions average
+        attendance_rate = total_sessions / expected_sessions
+
+        # Days since last session
+        last_session = student_data['session_date'].max()
+        days_since_last = (now - last_session).days
+
+        # Risk scoring
+        risk_score = 0
+        risk_factors = []
+
+        if avg_engagement < 5:
+            risk_score += 3
+            risk_factors.append("Low engagement")
+        elif avg_engagement < 7:
+            risk_score += 1
+
+        if engagement_trend < -2:
+            risk_score += 3
+            risk_factors.append("Declining engagement")
+        elif engagement_trend < -1:
+            risk_score += 2
+
+        if completion_rate < 0.7:
+            risk_score += 2
+            risk_factors.append("Low session completion")
+
+        if homework_rate < 0.5:
+            risk_score += 2
+            risk_factors.append("Low homework completion")
+
+        if attendance_rate < 0.6:
+            risk_score += 2
+            risk_factors.append("Poor attendance")
+
+        if days_since_last > 14:
+            risk_score += 2
+            risk_factors.append("Inactive student")
+
+        # Determine risk level
+        if risk_score >= 7:
+            risk_level = "High"
+        elif risk_score >= 4:
+            risk_level = "Medium"
+        else:
+            risk_level = "Low"
+
+        student_metrics.append({
+            'student_id': student_id,
+            'student_name': student_data['student_name'].iloc[0],
+            'grade_level': student_data['grade_level'].iloc[0],
+            'risk_level': risk_level,
+            'risk_score': risk_score,
+            'avg_engagement': avg_engagement,
+            'engagement_trend': engagement_trend,
+            'completion_rate': completion_rate,
+            'homework_rate': homework_rate,
+            'attendance_rate': attendance_rate,
+            'total_sessions': total_sessions,
+            'days_since_last': days_since_last,
+            'risk_factors': risk_factors,
+            'last_session': last_session
+        })
+
+    return pd.DataFrame(student_metrics)
+
+
+def generated_sessions(students=500, seed=7):
+    """Generated sessions in shuffled row order, with same-day sessions"""
+    with tempfile.TemporaryDirectory() as workdir:
+        path = generate_tutoring_data(os.path.join(workdir, "sessions.csv"), students=students, seed=seed)
+        df = pd.read_csv(path, parse_dates=['session_date'])
+    rng = np.random.default_rng(seed)
+    df = df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+    # Second sessions on a day a student already had, with other scores
+    extra = df.sample(frac=0.05, random_state=seed).copy()
+    extra['engagement_score'] = rng.integers(1, 11, len(extra))
+    return pd.concat([df, extra], ignore_index=True)
+
+
+class RiskEngineEquivalenceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sessions = generated_sessions()
+        cls.expected = reference_risk_metrics(cls.sessions, NOW)
+
+    def assertMatchesReference(self, metrics):
+        actual = decode_risk_factors(metrics).set_index('student_id')[OUTPUT_COLUMNS[1:]]
+        expected = self.expected.set_index('student_id').loc[actual.index]
+        self.assertEqual(len(actual), len(self.expected))
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_index_type=False)
+
+    def test_has_same_day_sessions(self):
+        self.assertTrue(self.sessions.duplicated(['student_id', 'session_date']).any())
+
+    def test_calculate_risk_metrics(self):
+        metrics = calculate_risk_metrics(self.sessions, now=NOW)
+        self.assertEqual(list(metrics['student_id']), list(self.expected['student_id']))
+        self.assertMatchesReference(metrics)
+
+    def test_parallel_workers(self):
+        self.assertMatchesReference(calculate_risk_metrics(self.sessions, now=NOW, workers=2))
+
+    def test_streamed_batches(self):
+        batches = (self.sessions.iloc[start:start + 2_000] for start in range(0, len(self.sessions), 2_000))
+        self.assertMatchesReference(score_session_batches(batches, now=NOW))
+
+    def test_incremental_store(self):
+        store = RiskMetricStore()
+        half = len(self.sessions) // 2
+        store.sync(self.sessions.iloc[:half], NOW)
+        self.assertMatchesReference(store.sync(self.sessions, NOW))
+
+    def test_store_appends_small_batches_serially(self):
+        store = RiskMetricStore(workers=2)
+        with mock.patch.object(risk_engine, "ProcessPoolExecutor",
+                               side_effect=AssertionError("process pool started for a small batch")):
+            store.sync(self.sessions.iloc[:-50], NOW)
+            self.assertMatchesReference(store.append(self.sessions.iloc[-50:], NOW))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Session storage: atomic CSV and Parquet writes
+
+    python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import threading
+import unittest
+
+import pandas as pd
+
+import session_io
+from generate_data import generate_tutoring_data
+
+
+@unittest.skipUnless(session_io.has_columnar_support(), "pyarrow is not installed")
+class AtomicWriteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.csv_path = generate_tutoring_data(os.path.join(self.workdir.name, "sessions.csv"),
+                                               students=20, seed=5)
+
+    def test_concurrent_conversions_of_one_file(self):
+        errors = []
+
+        def convert():
+            try:
+                session_io.convert_csv_to_parquet(self.csv_path)
+            except Exception as error:  # collected for the main thread
+                errors.append(error)
+
+        threads = [threading.Thread(target=convert) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(session_io.load_sessions(session_io.columnar_path(self.csv_path))),
+                         len(pd.read_csv(self.csv_path)))
+        self.assertEqual(sorted(os.listdir(self.workdir.name)), ["sessions.csv", "sessions.parquet"])
+
+    def test_failed_write_leaves_no_files(self):
+        sessions = pd.read_csv(self.csv_path)
+        path = os.path.join(self.workdir.name, "out.parquet")
+
+        def batches():
+            yield sessions.iloc[:50]
+            raise OSError("export interrupted")
+
+        with self.assertRaises(OSError):
+            session_io.write_session_batches(batches(), path)
+        self.assertEqual(os.listdir(self.workdir.name), ["sessions.csv"])
+        self.assertEqual(session_io.write_session_batches([sessions], path), path)
+        self.assertEqual(len(session_io.load_sessions(path)), len(sessions))
+
+
+if __name__ == "__main__":
+    unittest.main()